@@ -0,0 +1,269 @@
+# bench_resume.py
+# Micro-benchmarks for the resume builder PDF path.
+#   python bench_resume.py fonts -n 20
+#   python bench_resume.py layout
+#   python bench_resume.py templates -n 20 --batches 1 10 100
+#   python bench_resume.py suite -n 30 --json bench_results.json
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from multiprocessing import get_context
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import streamlitassignment as app
+
+SAMPLE_DATA = {
+    "full_name": "Jane Doe",
+    "phone": "+1 555 0100",
+    "email": "jane.doe@example.com",
+    "city_state": "Austin, TX",
+    "summary": "Registered nurse with eight years of acute care experience in busy "
+               "medical-surgical and telemetry units. Calm under pressure.",
+    "degree": "BSc Nursing",
+    "institution": "University of Texas",
+    "graduation_date": "May 2016",
+    "license_number": "RN-123456",
+    "job_title": "Staff Nurse",
+    "duties": "Managed care for 6 patients per shift\nAdministered medications\nTrained new hires",
+    "hard_skills": "Phlebotomy, EKG, IV therapy",
+    "soft_skills": "Communication, Empathy, Teamwork",
+}
+
+
+def _time_ms(fn, *args) -> float:
+    t0 = time.perf_counter()
+    fn(*args)
+    return (time.perf_counter() - t0) * 1000
+
+
+def _report(label: str, samples: list):
+    print(f"{label:<12} n={len(samples):<4} mean={statistics.mean(samples):8.2f} ms  "
+          f"median={statistics.median(samples):8.2f} ms  min={min(samples):8.2f} ms")
+
+
+def bench_fonts(n: int):
+    """Per-PDF latency with the font registry dropped before every PDF vs kept warm."""
+    cold = []
+    for _ in range(n):
+        app.get_font_registry.clear()
+        cold.append(_time_ms(app.generate_pdf, SAMPLE_DATA, None))
+
+    app.get_font_registry()  # warm up once
+    warm = [_time_ms(app.generate_pdf, SAMPLE_DATA, None) for _ in range(n)]
+
+    _report("cold cache", cold)
+    _report("warm cache", warm)
+    print(f"speedup      {statistics.median(cold) / statistics.median(warm):.1f}x (median)")
+
+
+def bench_layout(sizes):
+    """generate_pdf latency against the number of duty bullets; should grow linearly."""
+    app.get_font_registry()
+    duty = "Coordinated discharge planning with physicians, case managers and families"
+    prev = None
+    for n in sizes:
+        data = dict(SAMPLE_DATA, duties="\n".join(f"{duty} ({i})" for i in range(n)))
+        app.layout_lines.cache_clear()
+        ms = _time_ms(app.generate_pdf, data, None)
+        per = ms / n
+        growth = f"  x{ms / prev:.2f} vs previous" if prev else ""
+        print(f"{n:>6} bullets  {ms:9.2f} ms  {per * 1000:8.1f} us/bullet{growth}")
+        prev = ms
+
+
+def bench_templates(n: int, batches):
+    """
+    Cold compile cost of each built-in template against its per-record render
+    cost, and the compile share of a batch that compiles the template once.
+    """
+    app.get_font_registry()
+    for name in app.TEMPLATES:
+        compile_ms = []
+        for _ in range(n):
+            app.compile_template.cache_clear()
+            compile_ms.append(_time_ms(app.compile_template, name))
+        render_ms = [_time_ms(app.generate_pdf, SAMPLE_DATA, None, name) for _ in range(n)]
+        c, r = statistics.median(compile_ms), statistics.median(render_ms)
+        print(f"[{name}] compile {c:.3f} ms cold, render {r:.2f} ms/record (medians of {n})")
+        print(f"{'records':>9} {'compile ms/record':>17} {'batch ms':>10} {'compile share':>14}")
+        for size in batches:
+            total = c + size * r
+            print(f"{size:>9} {c / size:>17.4f} {total:>10.1f} {100 * c / total:>13.4f}%")
+
+
+# ---------- Scenario suite ----------
+WORDS = ("patient care triage medication telemetry assessment charting discharge "
+         "education wound infusion monitoring protocol safety handover escalation "
+         "vital signs documentation family clinical team compassionate").split()
+
+# scenario -> synthetic record parameters
+SCENARIOS = {
+    "baseline": {},
+    "long_summary": {"summary_words": 2500},
+    "duties_200": {"duties": 200},
+    "photo_5mb": {"photo_bytes": 5_000_000},
+    "many_skills": {"skills": 400},
+}
+
+
+def synthetic_record(rng: random.Random, summary_words=60, duties=5, skills=6) -> dict:
+    """Form data shaped like a real submission, scaled by the given knobs."""
+    def words(n):
+        return " ".join(rng.choice(WORDS) for _ in range(n))
+
+    return dict(
+        SAMPLE_DATA,
+        summary=words(summary_words).capitalize() + ".",
+        duties="\n".join(words(rng.randint(6, 22)).capitalize() for _ in range(duties)),
+        hard_skills=", ".join(words(rng.randint(1, 3)).title() for _ in range(skills)),
+        soft_skills=", ".join(words(rng.randint(1, 2)).title() for _ in range(max(1, skills // 2))),
+    )
+
+
+def synthetic_photo(target_bytes: int, seed: int = 0) -> bytes:
+    """A noisy JPEG of roughly target_bytes; noise defeats compression, like a raw phone shot."""
+    from PIL import Image
+    rng = random.Random(seed)
+    # high-quality JPEG of pure noise costs roughly 1.2 bytes per pixel
+    side = max(16, int((target_bytes / 1.2) ** 0.5))
+    w, h = side * 4 // 3, side * 3 // 4
+    img = Image.frombytes("RGB", (w, h), rng.randbytes(w * h * 3))
+    bio = BytesIO()
+    img.save(bio, format="JPEG", quality=95)
+    return bio.getvalue()
+
+
+def _percentile(samples: list, p: float) -> float:
+    ordered = sorted(samples)
+    k = max(0, min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1))  # nearest rank
+    return ordered[k]
+
+
+def _peak_rss_kb() -> int:
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak  # macOS reports bytes
+
+
+def _clear_caches():
+    app.get_photo_cache.clear()
+    app.layout_lines.cache_clear()
+
+
+def run_scenario(name: str, n: int, seed: int = 0, cold: bool = False) -> dict:
+    """
+    Render one scenario n times and collect latency percentiles, output size,
+    tracemalloc peak (from one extra traced render, so tracing does not skew
+    the timings) and this process's peak RSS.
+    Photo scenarios use a different photo on every render, like distinct
+    applicants, so each render pays for the decode instead of a PhotoCache hit.
+    """
+    params = dict(SCENARIOS[name])
+    photo_bytes = params.pop("photo_bytes", 0)
+    rng = random.Random(seed)
+    records = [synthetic_record(rng, **params) for _ in range(n)]
+
+    app.get_font_registry()
+    app.compile_template(app.DEFAULT_TEMPLATE)
+    samples, out_size, photo = [], 0, None
+    for i, data in enumerate(records):
+        if photo_bytes:
+            photo = synthetic_photo(photo_bytes, seed + i)  # built outside the timed render
+        if cold:
+            _clear_caches()
+        t0 = time.perf_counter()
+        pdf = app.generate_pdf(data, photo)
+        samples.append((time.perf_counter() - t0) * 1000)
+        out_size = max(out_size, len(pdf))
+
+    _clear_caches()
+    tracemalloc.start()
+    app.generate_pdf(records[0], photo)
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "scenario": name,
+        "n": n,
+        "cold": cold,
+        "p50_ms": round(_percentile(samples, 50), 3),
+        "p95_ms": round(_percentile(samples, 95), 3),
+        "mean_ms": round(statistics.mean(samples), 3),
+        "peak_rss_kb": _peak_rss_kb(),
+        "tracemalloc_peak_kb": traced_peak // 1024,
+        "output_bytes": out_size,
+        "photo_bytes": len(photo) if photo else 0,
+    }
+
+
+def bench_suite(names: list, n: int, seed: int, cold: bool, json_path: str = None) -> dict:
+    """Run each scenario in a fresh process so peak RSS is per scenario."""
+    results = []
+    for name in names:
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            res = pool.submit(run_scenario, name, n, seed, cold).result()
+        results.append(res)
+        print(f"{name:<14} p50={res['p50_ms']:9.2f} ms  p95={res['p95_ms']:9.2f} ms  "
+              f"rss={res['peak_rss_kb'] / 1024:7.1f} MB  traced={res['tracemalloc_peak_kb'] / 1024:7.1f} MB  "
+              f"pdf={res['output_bytes'] / 1024:8.1f} KB")
+
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "seed": seed,
+        "results": results,
+    }
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"wrote {json_path}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resume builder PDF benchmarks")
+    sub = parser.add_subparsers(dest="bench", required=True)
+    fonts = sub.add_parser("fonts", help="cold vs warm font registry")
+    fonts.add_argument("-n", type=int, default=20, help="PDFs per run")
+    layout = sub.add_parser("layout", help="latency vs duty list length")
+    layout.add_argument("--sizes", type=int, nargs="+", default=[100, 200, 400, 800, 1600])
+    templates = sub.add_parser("templates", help="template compile cost amortized over a batch")
+    templates.add_argument("-n", type=int, default=20, help="samples per measurement")
+    templates.add_argument("--batches", type=int, nargs="+", default=[1, 10, 100], help="records per batch")
+    suite = sub.add_parser("suite", help="latency/memory/output size per synthetic scenario")
+    suite.add_argument("-n", type=int, default=30, help="renders per scenario")
+    suite.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    suite.add_argument("--seed", type=int, default=0)
+    suite.add_argument("--cold", action="store_true", help="clear photo/layout caches before every render")
+    suite.add_argument("--json", dest="json_path", help="write machine-readable results here")
+    args = parser.parse_args()
+
+    if args.bench == "fonts":
+        bench_fonts(args.n)
+    elif args.bench == "layout":
+        bench_layout(args.sizes)
+    elif args.bench == "templates":
+        bench_templates(args.n, args.batches)
+    elif args.bench == "suite":
+        bench_suite(args.scenarios, args.n, args.seed, args.cold, args.json_path)
+
+
+if __name__ == "__main__":
+    main()
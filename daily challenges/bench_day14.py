@@ -0,0 +1,107 @@
+# bench_day14.py
+# Benchmarks for the stopwatch timing code behind day14.py.
+#   python "daily challenges/bench_day14.py" race
+#   python "daily challenges/bench_day14.py" laps
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+import stopwatch_engine
+
+
+def _ms(fn):
+    t0 = time.perf_counter()
+    fn()
+    return (time.perf_counter() - t0) * 1000
+
+
+def dict_race(n):
+    """The single-timer session-state layout, repeated per athlete: one dict per timer."""
+    return {bib: {"running": False, "start_time": None, "elapsed_time": 0.0, "laps": []}
+            for bib in range(1, n + 1)}
+
+
+def dict_start_all(timers):
+    for t in timers.values():
+        t["running"], t["start_time"] = True, time.time()
+
+
+def dict_lap_all(timers):
+    for t in timers.values():
+        t["laps"].append(t["elapsed_time"] + time.time() - t["start_time"])
+
+
+def dict_standings(timers):
+    rows = []
+    for bib, t in timers.items():
+        laps = t["laps"]
+        splits = [b - a for a, b in zip([0.0] + laps[:-1], laps)]
+        rows.append((bib, len(laps), min(splits, default=0), statistics.fmean(splits) if splits else 0,
+                     max(splits, default=0), laps[-1] if laps else 0))
+    rows.sort(key=lambda r: (-r[1], r[5]))
+    return rows
+
+
+def bench_race(sizes, laps, repeats=5):
+    """start-all / lap-all / standings cost, per-timer dicts vs RaceTimers arrays."""
+    print(f"{'timers':>7} {'op':<10} {'dicts ms':>10} {'arrays ms':>10} {'speedup':>8}")
+    for n in sizes:
+        results = {"start all": ([], []), "lap all": ([], []), "standings": ([], [])}
+        for _ in range(repeats):
+            timers = dict_race(n)
+            race = stopwatch_engine.RaceTimers()
+            race.add(np.arange(1, n + 1))
+            results["start all"][0].append(_ms(lambda: dict_start_all(timers)))
+            results["start all"][1].append(_ms(lambda: race.start()))
+            results["lap all"][0].append(_ms(lambda: [dict_lap_all(timers) for _ in range(laps)]) / laps)
+            results["lap all"][1].append(_ms(lambda: [race.lap() for _ in range(laps)]) / laps)
+            results["standings"][0].append(_ms(lambda: dict_standings(timers)))
+            results["standings"][1].append(_ms(lambda: race.standings()))
+        for op, (dicts, arrays) in results.items():
+            d, a = statistics.median(dicts), statistics.median(arrays)
+            print(f"{n:>7} {op:<10} {d:>10.3f} {a:>10.3f} {d / max(a, 1e-9):>7.1f}x")
+
+
+def list_lap(laps, cumulative, window=stopwatch_engine.ROLLING_WINDOW):
+    """A cumulative-times list with every stat recomputed over the full list on each lap."""
+    laps.append(cumulative)
+    splits = [b - a for a, b in zip([0.0] + laps[:-1], laps)]
+    return min(splits), max(splits), statistics.fmean(splits), statistics.fmean(splits[-window:])
+
+
+def bench_laps(sizes, samples=200, page_size=20):
+    """Cost of one more lap (add + stats) and of one table page, after `size` laps."""
+    print(f"{'laps':>8} {'list us/lap':>12} {'LapLog us/lap':>14} {'page us':>9}")
+    rng = np.random.default_rng(0)
+    for n in sizes:
+        cum = np.cumsum(rng.uniform(20, 40, n + samples)).tolist()
+        laps, log = cum[:n], stopwatch_engine.LapLog()
+        for c in laps:
+            log.add(c)
+        tail = cum[n:]
+        t_list = _ms(lambda: [list_lap(laps, c) for c in tail]) * 1000 / samples
+        t_log = _ms(lambda: [(log.add(c), log.mean, log.rolling_mean) for c in tail]) * 1000 / samples
+        t_page = _ms(lambda: [log.page(p, page_size) for p in range(samples)]) * 1000 / samples
+        print(f"{n:>8} {t_list:>12.1f} {t_log:>14.2f} {t_page:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stopwatch benchmarks")
+    sub = parser.add_subparsers(dest="bench", required=True)
+    race = sub.add_parser("race", help="bulk timer operations, dicts vs arrays")
+    race.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500, 2000])
+    race.add_argument("--laps", type=int, default=20, help="laps per timer before standings")
+    laps = sub.add_parser("laps", help="per-lap stats cost vs lap count, list vs LapLog")
+    laps.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000, 100000])
+    args = parser.parse_args()
+
+    if args.bench == "race":
+        bench_race(args.sizes, args.laps)
+    elif args.bench == "laps":
+        bench_laps(args.sizes)
+
+
+if __name__ == "__main__":
+    main()
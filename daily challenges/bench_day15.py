@@ -0,0 +1,433 @@
+# bench_day15.py
+# Benchmarks for the Snake game logic in day15.py.
+#   python "daily challenges/bench_day15.py" body
+#   python "daily challenges/bench_day15.py" food
+#   python "daily challenges/bench_day15.py" frames
+#   python "daily challenges/bench_day15.py" engine
+#   python "daily challenges/bench_day15.py" transport
+#   python "daily challenges/bench_day15.py" replay --db .snake_leaderboard.sqlite3 --dir replays/
+#   python "daily challenges/bench_day15.py" autopilot
+#   python "daily challenges/bench_day15.py" autoplay --grids 10 20 --games 30
+#   python "daily challenges/bench_day15.py" large
+import argparse
+import glob
+import json
+import os
+import sqlite3
+import sys
+import random
+import statistics
+import time
+
+import numpy as np
+
+import day15
+import snake_engine
+
+
+def serpentine_cycle(rows, cols):
+    """A Hamiltonian cycle over a grid with an even number of rows, so a snake can follow it forever."""
+    path = [(0, c) for c in range(cols)]
+    for r in range(1, rows):
+        cs = range(cols - 1, 0, -1) if r % 2 else range(1, cols)
+        path += [(r, c) for c in cs]
+    path += [(r, 0) for r in range(rows - 1, 0, -1)]
+    return path
+
+
+def _ticks_per_sec(fn, ticks):
+    t0 = time.perf_counter()
+    fn(ticks)
+    return ticks / (time.perf_counter() - t0)
+
+
+def bench_body(lengths, ticks, rows=200, cols=200):
+    """Ticks/sec of move + self-collision check against snake length: old list vs SnakeBody."""
+    cycle = serpentine_cycle(rows, cols)
+    n = len(cycle)
+    print(f"grid {rows}x{cols}, {ticks} ticks per run")
+    print(f"{'length':>8} {'list ticks/s':>14} {'SnakeBody ticks/s':>18} {'speedup':>8}")
+    for length in lengths:
+        def run_list(k, snake=cycle[:length]):
+            pos = length
+            for _ in range(k):
+                new_head = cycle[pos % n]
+                if new_head in snake:
+                    raise RuntimeError("collision")
+                snake.pop(0)
+                snake.append(new_head)
+                pos += 1
+
+        def run_body(k, snake=snake_engine.SnakeBody(cycle[:length])):
+            pos = length
+            for _ in range(k):
+                new_head = cycle[pos % n]
+                if new_head in snake:
+                    raise RuntimeError("collision")
+                snake.move(new_head)
+                pos += 1
+
+        old = _ticks_per_sec(run_list, ticks)
+        new = _ticks_per_sec(run_body, ticks)
+        print(f"{length:>8} {old:>14,.0f} {new:>18,.0f} {new / old:>7.1f}x")
+
+
+def bench_food(grids, fills, placements=200):
+    """Cost of one food placement vs board fill: full-grid scan vs FreeCellIndex."""
+    rng = random.Random(0)
+    print(f"{'grid':>9} {'fill':>5} {'scan us':>10} {'index us':>10}")
+    for side in grids:
+        cycle = serpentine_cycle(side, side)
+        for fill in fills:
+            snake = cycle[:max(1, int(len(cycle) * fill))]
+
+            def scan(k):
+                occupied = set(snake)
+                for _ in range(k):
+                    free = [(r, c) for r in range(side) for c in range(side) if (r, c) not in occupied]
+                    rng.choice(free)
+
+            index = snake_engine.FreeCellIndex((side, side), snake)
+
+            def pick(k):
+                for _ in range(k):
+                    snake_engine.place_food(index, rng)
+
+            scan_us = 1e6 / _ticks_per_sec(scan, placements)
+            index_us = 1e6 / _ticks_per_sec(pick, placements)
+            print(f"{side:>4}x{side:<4} {fill:>5.0%} {scan_us:>10.1f} {index_us:>10.2f}")
+
+
+def bench_frames(lengths, frames, side=28, cell_size=18):
+    """Frame time vs snake length: full redraw (draw_board) vs the dirty-cell BoardRenderer."""
+    cycle = serpentine_cycle(side, side)
+    n = len(cycle)
+    day15._static_layer((side, side), cell_size)  # warm the shared caches
+    day15._segment_sprites(cell_size)
+    print(f"grid {side}x{side} @ {cell_size}px, {frames} frames per run")
+    print(f"{'length':>8} {'full ms':>9} {'dirty ms':>9} {'dirty cells':>12}")
+    for length in lengths:
+        if length >= n - 1:
+            continue
+        snake = snake_engine.SnakeBody(cycle[:length])
+        renderer = day15.BoardRenderer((side, side), cell_size)
+        full, dirty = [], []
+        pos = length
+        for f in range(frames):
+            food = cycle[(pos + n // 2) % n]
+            t0 = time.perf_counter()
+            day15.draw_board((side, side), snake, food, cell_size=cell_size, pulse_frame=f % 30)
+            full.append((time.perf_counter() - t0) * 1000)
+            t0 = time.perf_counter()
+            renderer.render(snake, food, pulse_frame=f % 30)
+            dirty.append((time.perf_counter() - t0) * 1000)
+            snake.move(cycle[pos % n])
+            pos += 1
+        print(f"{length:>8} {statistics.median(full):>9.3f} {statistics.median(dirty):>9.3f} "
+              f"{renderer.dirty_cells:>12}")
+
+
+def bench_engine(batches, ticks, side=20, seed=0):
+    """Live game-ticks/sec: the scalar engine one game at a time vs BatchSimulator, random play."""
+    grid = (side, side)
+
+    def scalar(k):
+        rng = random.Random(seed)
+        state = snake_engine.new_game(grid, rng)
+        for _ in range(k):
+            if state["game_over"]:
+                state = snake_engine.new_game(grid, rng)
+            snake_engine.turn(state, rng.choice(snake_engine.DIRECTIONS))
+            snake_engine.advance(state, rng)
+
+    print(f"grid {side}x{side}, {ticks} ticks per run, random play")
+    print(f"{'games':>8} {'game-ticks/s':>14} {'vs scalar':>10}")
+    base = _ticks_per_sec(scalar, ticks * 10)
+    print(f"{'scalar':>8} {base:>14,.0f} {1:>9.1f}x")
+    for n in batches:
+        sim = snake_engine.BatchSimulator(n, grid, seed=seed)
+
+        def batch(k):
+            for _ in range(k):
+                sim.reset(np.flatnonzero(~sim.alive))  # restart finished games in place
+                sim.step(sim.random_actions())
+
+        rate = _ticks_per_sec(batch, ticks) * n
+        print(f"{n:>8} {rate:>14,.0f} {rate / base:>9.1f}x")
+
+
+def bench_transport(lengths, frames, side=28, cell_size=18):
+    """Encode time and bytes per frame for each server frame transport, vs snake length."""
+    cycle = serpentine_cycle(side, side)
+    n = len(cycle)
+    print(f"grid {side}x{side} @ {cell_size}px, {frames} frames per run")
+    print(f"{'length':>8} {'mode':<12} {'encode ms':>10} {'bytes/frame':>12}")
+    for length in lengths:
+        if length >= n - 1:
+            continue
+        for mode in day15.FRAME_MODES:
+            snake = snake_engine.SnakeBody(cycle[:length])
+            renderer = day15.BoardRenderer((side, side), cell_size)
+            state = {"grid_size": (side, side), "cell_size": cell_size, "pulse_frame": 0}
+            times, sizes = [], []
+            pos = length
+            for f in range(frames):
+                food = cycle[(pos + n // 2) % n]
+                state["pulse_frame"] = f % 30
+                if mode == "Canvas diff":
+                    t0 = time.perf_counter()
+                    data = json.dumps(day15.canvas_frame(state, snake, food), separators=(",", ":"))
+                else:
+                    img = renderer.render(snake, food, pulse_frame=f % 30)
+                    t0 = time.perf_counter()
+                    data = day15.encode_png(img, palette=mode == "Palette PNG")
+                times.append((time.perf_counter() - t0) * 1000)
+                sizes.append(len(data))
+                snake.move(cycle[pos % n])
+                pos += 1
+            print(f"{length:>8} {mode:<12} {statistics.median(times):>10.3f} {statistics.mean(sizes):>12,.0f}")
+
+
+def greedy_run(grid, seed, max_ticks=20000):
+    """Record one run of a greedy bot (head for the food, avoid instant death) as a Replay."""
+    rng = random.Random(seed)
+    state = snake_engine.new_game(grid, rng)
+    recorder = snake_engine.ReplayRecorder(grid, seed)
+    rows, cols = grid
+    while not state["game_over"] and recorder.replay.ticks < max_ticks:
+        head, food = state["snake"].head, state["food_pos"]
+        best = None
+        for d in snake_engine.DIRECTIONS:
+            cell = (head[0] + d[0], head[1] + d[1])
+            if not (0 <= cell[0] < rows and 0 <= cell[1] < cols) or cell in state["snake"]:
+                continue
+            dist = abs(cell[0] - food[0]) + abs(cell[1] - food[1])
+            if best is None or dist < best[0]:
+                best = (dist, d)
+        if best:
+            snake_engine.turn(state, best[1])
+        recorder.record(state["next_direction"])
+        snake_engine.advance(state, rng)
+    return recorder.finish(state["score"])
+
+
+def load_corpus(db=None, directory=None):
+    """Replays from a leaderboard database and/or a directory of .snkr files, as (name, bytes)."""
+    corpus = []
+    if db and os.path.exists(db):
+        with sqlite3.connect(db) as conn:
+            for rowid, data in conn.execute("SELECT rowid, data FROM replays ORDER BY rowid"):
+                corpus.append((f"db:{rowid}", data))
+    if directory:
+        for path in sorted(glob.glob(os.path.join(directory, "*.snkr"))):
+            with open(path, "rb") as f:
+                corpus.append((os.path.basename(path), f.read()))
+    return corpus
+
+
+def bench_replay(db, directory, synthetic, seed=0, save=None):
+    """
+    Replay a corpus headlessly: ticks/sec for the engine, and a regression check
+    that every run still ends with its recorded score. Exits 1 on any mismatch.
+    """
+    corpus = load_corpus(db, directory)
+    if synthetic:
+        rng = random.Random(seed)
+        for i in range(synthetic):
+            grid = rng.choice([(12, 12), (20, 20), (28, 28)])
+            replay = greedy_run(grid, rng.getrandbits(64))
+            corpus.append((f"bot:{i}", replay.to_bytes()))
+    if save:
+        os.makedirs(save, exist_ok=True)
+        for name, data in corpus:
+            with open(os.path.join(save, name.replace(":", "_") + ".snkr"), "wb") as f:
+                f.write(data)
+    if not corpus:
+        print("empty corpus: pass --db, --dir or --synthetic N")
+        return
+
+    total_ticks = total_bytes = 0
+    mismatches = []
+    t0 = time.perf_counter()
+    for name, data in corpus:
+        replay = snake_engine.Replay.from_bytes(data)
+        state = snake_engine.play_replay(replay)
+        total_ticks += replay.ticks
+        total_bytes += len(data)
+        if state["score"] != replay.score:
+            mismatches.append((name, replay.score, state["score"]))
+    elapsed = time.perf_counter() - t0
+    print(f"{len(corpus)} replays, {total_ticks:,} ticks, {total_bytes / len(corpus):.0f} bytes/replay avg")
+    print(f"replayed in {elapsed * 1000:.1f} ms: {total_ticks / elapsed:,.0f} ticks/s")
+    for name, want, got in mismatches:
+        print(f"MISMATCH {name}: recorded score {want}, replayed {got}")
+    if mismatches:
+        sys.exit(1)
+
+
+def prefilled_game(side, fill, rng):
+    """An engine game whose snake already covers `fill` of the board along a serpentine path."""
+    grid = (side, side)
+    state = snake_engine.new_game(grid, rng)
+    cycle = serpentine_cycle(side, side)
+    cells = cycle[:max(3, int(len(cycle) * fill))]
+    state["snake"] = snake_engine.SnakeBody(cells)
+    state["free_cells"] = snake_engine.FreeCellIndex(grid, cells)
+    state["food_pos"] = snake_engine.place_food(state["free_cells"], rng)
+    head, neck = cells[-1], cells[-2]
+    state["direction"] = state["next_direction"] = (head[0] - neck[0], head[1] - neck[1])
+    return state
+
+
+def bench_autopilot(grids, fills, ticks, seed=0, budget_ms=60):
+    """Autopilot decision time per tick vs grid size and starting snake length."""
+    print(f"{ticks} ticks per run, budget {budget_ms} ms (the minimum tick)")
+    print(f"{'grid':>9} {'length':>7} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} "
+          f"{'BFS/tick':>9} {'score':>6} {'over budget':>12}")
+    for side in grids:
+        if side % 2:
+            continue  # serpentine prefill needs an even number of rows
+        for fill in fills:
+            rng = random.Random(seed)
+            state = prefilled_game(side, fill, rng)
+            pilot = snake_engine.Autopilot((side, side))
+            start_len = len(state["snake"])
+            samples = []
+            for _ in range(ticks):
+                if state["game_over"]:
+                    break
+                t0 = time.perf_counter()
+                direction = pilot.decide(state)
+                samples.append((time.perf_counter() - t0) * 1000)
+                snake_engine.turn(state, direction)
+                snake_engine.advance(state, rng)
+            samples.sort()
+            over = sum(1 for ms in samples if ms > budget_ms)
+            print(f"{side:>4}x{side:<4} {start_len:>7} {samples[len(samples) // 2]:>8.3f} "
+                  f"{samples[int(len(samples) * 0.95)]:>8.3f} {samples[-1]:>8.2f} "
+                  f"{pilot.searches / len(samples):>9.2f} {state['score']:>6} {over:>12}")
+
+
+def bench_autoplay(grids, games, seed=0):
+    """Whole autopilot games: how they end (won / died / stuck) and the score reached."""
+    print(f"{'grid':>9} {'games':>6} {'won':>5} {'died':>5} {'stuck':>6} {'mean score':>11} "
+          f"{'mean ticks':>11} {'max ms':>8}")
+    for side in grids:
+        grid = (side, side)
+        won = died = stuck = 0
+        scores, ticks, worst = [], [], 0.0
+        for g in range(games):
+            rng = random.Random(seed + g)
+            state = snake_engine.new_game(grid, rng)
+            pilot = snake_engine.Autopilot(grid)
+            t = 0
+            while not state["game_over"] and not pilot.stuck:
+                t0 = time.perf_counter()
+                snake_engine.turn(state, pilot.decide(state))
+                worst = max(worst, time.perf_counter() - t0)
+                snake_engine.advance(state, rng)
+                t += 1
+            won += state["won"]
+            died += state["game_over"] and not state["won"]
+            stuck += pilot.stuck and not state["game_over"]
+            scores.append(state["score"])
+            ticks.append(t)
+        print(f"{side:>4}x{side:<4} {games:>6} {won:>5} {died:>5} {stuck:>6} {statistics.mean(scores):>11.1f} "
+              f"{statistics.mean(ticks):>11.0f} {worst * 1000:>8.2f}")
+
+
+def bench_large(grids, ticks, seed=0, budget_ms=60):
+    """Server tick budget per board size: autopilot, engine step, render and PNG encode."""
+    print(f"{ticks} autopilot ticks per board, budget {budget_ms} ms (the minimum tick)")
+    print(f"{'grid':>9} {'layout':>16} {'phase':>10} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+    for side in grids:
+        grid = (side, side)
+        cell, view = day15.board_layout(grid)
+        renderer = day15.ViewportRenderer(grid, cell, view) if view else day15.BoardRenderer(grid, cell)
+        rng = random.Random(seed)
+        state = snake_engine.new_game(grid, rng)
+        pilot = snake_engine.Autopilot(grid)
+        phases = {"autopilot": [], "step": [], "render": [], "encode": [], "total": []}
+        for t in range(ticks):
+            if state["game_over"]:
+                state = snake_engine.new_game(grid, rng)
+            t0 = time.perf_counter()
+            snake_engine.turn(state, pilot.decide(state))
+            t1 = time.perf_counter()
+            snake_engine.advance(state, rng)
+            t2 = time.perf_counter()
+            img = renderer.render(state["snake"], state["food_pos"], pulse_frame=t % 30)
+            t3 = time.perf_counter()
+            day15.encode_png(img)
+            t4 = time.perf_counter()
+            for name, ms in zip(phases, (t1 - t0, t2 - t1, t3 - t2, t4 - t3, t4 - t0)):
+                phases[name].append(ms * 1000)
+        layout = f"{cell}px" + (f" view {view[0]}x{view[1]}" if view else " whole")
+        for name, samples in phases.items():
+            samples.sort()
+            print(f"{side:>4}x{side:<4} {layout:>16} {name:>10} {samples[len(samples) // 2]:>8.3f} "
+                  f"{samples[int(len(samples) * 0.95)]:>8.3f} {samples[-1]:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Snake game benchmarks")
+    sub = parser.add_subparsers(dest="bench", required=True)
+    body = sub.add_parser("body", help="ticks/sec vs snake length")
+    body.add_argument("--lengths", type=int, nargs="+", default=[10, 100, 1000, 10000, 30000])
+    body.add_argument("--ticks", type=int, default=20000)
+    food = sub.add_parser("food", help="food placement cost vs board fill")
+    food.add_argument("--grids", type=int, nargs="+", default=[20, 28, 100, 200])
+    food.add_argument("--fills", type=float, nargs="+", default=[0.01, 0.5, 0.95])
+    frames = sub.add_parser("frames", help="frame time vs snake length")
+    frames.add_argument("--lengths", type=int, nargs="+", default=[3, 50, 200, 500, 750])
+    frames.add_argument("--frames", type=int, default=100)
+    engine = sub.add_parser("engine", help="scalar engine vs batched simulator throughput")
+    engine.add_argument("--batches", type=int, nargs="+", default=[1, 100, 1000, 10000])
+    engine.add_argument("--ticks", type=int, default=500)
+    engine.add_argument("--seed", type=int, default=0)
+    transport = sub.add_parser("transport", help="encode time and bytes per frame per transport")
+    transport.add_argument("--lengths", type=int, nargs="+", default=[3, 200, 700])
+    transport.add_argument("--frames", type=int, default=100)
+    replay = sub.add_parser("replay", help="replay a corpus: engine throughput + regression check")
+    replay.add_argument("--db", help="leaderboard database with stored replays")
+    replay.add_argument("--dir", help="directory of .snkr replay files")
+    replay.add_argument("--synthetic", type=int, default=0, help="add N recorded greedy-bot runs")
+    replay.add_argument("--seed", type=int, default=0)
+    replay.add_argument("--save", help="write the whole corpus as .snkr files here")
+    autopilot = sub.add_parser("autopilot", help="autopilot decision time vs grid size and snake length")
+    autopilot.add_argument("--grids", type=int, nargs="+", default=[20, 50, 100, 200])
+    autopilot.add_argument("--fills", type=float, nargs="+", default=[0.0, 0.25, 0.5])
+    autopilot.add_argument("--ticks", type=int, default=2000)
+    autopilot.add_argument("--seed", type=int, default=0)
+    autoplay = sub.add_parser("autoplay", help="whole autopilot games: won / died / stuck")
+    autoplay.add_argument("--grids", type=int, nargs="+", default=[10, 12, 20])
+    autoplay.add_argument("--games", type=int, default=30)
+    autoplay.add_argument("--seed", type=int, default=0)
+    large = sub.add_parser("large", help="server tick budget on large boards")
+    large.add_argument("--grids", type=int, nargs="+", default=[20, 100, 200])
+    large.add_argument("--ticks", type=int, default=1000)
+    large.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.bench == "body":
+        bench_body(args.lengths, args.ticks)
+    elif args.bench == "food":
+        bench_food(args.grids, args.fills)
+    elif args.bench == "frames":
+        bench_frames(args.lengths, args.frames)
+    elif args.bench == "engine":
+        bench_engine(args.batches, args.ticks, seed=args.seed)
+    elif args.bench == "transport":
+        bench_transport(args.lengths, args.frames)
+    elif args.bench == "replay":
+        bench_replay(args.db, args.dir, args.synthetic, args.seed, args.save)
+    elif args.bench == "autopilot":
+        bench_autopilot(args.grids, args.fills, args.ticks, args.seed)
+    elif args.bench == "autoplay":
+        bench_autoplay(args.grids, args.games, args.seed)
+    elif args.bench == "large":
+        bench_large(args.grids, args.ticks, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,9 @@ from streamlit_lottie import st_lottie
 import requests
 import random
 import time
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
 
 # ---------------------------------------------------
 # Page Config
@@ -41,21 +44,79 @@ st.markdown(
 # ---------------------------------------------------
 # Asset Loading
 # ---------------------------------------------------
-@st.cache_data(show_spinner=False)
-def load_lottie(url: str):
+# Startup never waits on the network: every animation is served right away
+# from the disk cache or the bundled copy in lottie_assets/, while a background
+# pool refreshes missing or stale cache entries concurrently with timeouts.
+# A download that lands later is picked up on the next rerun.
+LOTTIE_URLS = {
+    "rock": "https://assets6.lottiefiles.com/private_files/lf30_rock.json",
+    "paper": "https://assets2.lottiefiles.com/packages/lf20_paper.json",
+    "scissors": "https://assets7.lottiefiles.com/packages/lf20_scissors.json",
+}
+BUNDLED_LOTTIE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lottie_assets")
+LOTTIE_CACHE_DIR = ".lottie_cache"
+LOTTIE_CACHE_MAX_AGE = 7 * 24 * 3600  # seconds before a cached download is refreshed
+LOTTIE_TIMEOUT = (3.05, 10)  # connect, read (seconds)
+
+def is_lottie(data):
+    return isinstance(data, dict) and isinstance(data.get("layers"), list)
+
+def read_lottie(path: str):
     try:
-        r = requests.get(url)
-        if r.status_code == 200:
-            return r.json()
-    except Exception:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
         return None
-    return None
+    return data if is_lottie(data) else None
 
-ASSETS = {
-    "rock": load_lottie("https://assets6.lottiefiles.com/private_files/lf30_rock.json"),
-    "paper": load_lottie("https://assets2.lottiefiles.com/packages/lf20_paper.json"),
-    "scissors": load_lottie("https://assets7.lottiefiles.com/packages/lf20_scissors.json"),
-}
+class LottieAssets:
+    """Animations by name: downloaded > disk cache > bundled fallback. Lookups never block."""
+
+    def __init__(self, urls, cache_dir=LOTTIE_CACHE_DIR, bundled_dir=BUNDLED_LOTTIE_DIR,
+                 max_age=LOTTIE_CACHE_MAX_AGE):
+        self.cache_dir = cache_dir
+        self._assets = {}
+        stale = []
+        for name in urls:
+            path = os.path.join(cache_dir, f"{name}.json")
+            cached = read_lottie(path)
+            if cached is None or time.time() - os.path.getmtime(path) > max_age:
+                stale.append(name)
+            self._assets[name] = cached or read_lottie(os.path.join(bundled_dir, f"{name}.json"))
+        if stale:
+            pool = ThreadPoolExecutor(max_workers=len(stale), thread_name_prefix="lottie-fetch")
+            for name in stale:
+                pool.submit(self._fetch, name, urls[name])
+            pool.shutdown(wait=False)
+
+    def _fetch(self, name, url):
+        try:
+            r = requests.get(url, timeout=LOTTIE_TIMEOUT)
+            r.raise_for_status()
+            data = r.json()
+        except (requests.RequestException, ValueError):
+            return  # keep serving the cached or bundled copy
+        if not is_lottie(data):
+            return
+        self._assets[name] = data
+        path = os.path.join(self.cache_dir, f"{name}.json")
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp, path)  # readers never see a half-written file
+        except OSError:
+            pass
+
+    def __getitem__(self, name):
+        return self._assets.get(name)
+
+@st.cache_resource(show_spinner=False)
+def get_assets():
+    return LottieAssets(LOTTIE_URLS)
+
+ASSETS = get_assets()
 
 # ---------------------------------------------------
 # Init Session State
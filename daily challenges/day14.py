@@ -1,5 +1,10 @@
 import streamlit as st
+import streamlit.components.v1 as components
+import functools
+import os
+import threading
 import time
+from stopwatch_engine import LapLog, RaceTimers, table_to_csv, table_to_parquet, to_seconds
 
 # Page configuration
 st.set_page_config(
@@ -62,6 +67,22 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Display modes. In "Browser" mode the page counts up by itself from the
+# server-issued start timestamp, so the server only runs on start/stop/lap/reset.
+# "Server" mode redraws the timer in a fragment a few times per second instead
+# of rerunning the whole script every 10 ms.
+DISPLAY_MODES = ["Browser (interpolated)", "Server (fragment refresh)"]
+FRAGMENT_REFRESH_S = 0.5
+PAGES = ["Stopwatch", "Race"]
+RACE_REFRESH_S = 1.0
+MAX_NUMBERED_BIBS = 1000
+MAX_BIB = 999_999_999  # well inside the engine's int64 bib array
+LAP_PAGE_SIZE = 20
+
+_stopwatch_timer = components.declare_component(
+    "stopwatch_timer", path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "stopwatch_component"))
+_meter = threading.local()  # set while a metered call runs on this session's script thread
+
 def init_session_state():
     """Initialize all session state variables"""
     if 'running' not in st.session_state:
@@ -72,6 +93,14 @@ def init_session_state():
         st.session_state.elapsed_time = 0.0
     if 'last_update' not in st.session_state:
         st.session_state.last_update = 0
+    if not isinstance(st.session_state.get('laps'), LapLog):  # older sessions kept a plain list
+        st.session_state.laps = LapLog()
+    if 'display_mode' not in st.session_state:
+        st.session_state.display_mode = DISPLAY_MODES[0]
+    if 'cpu_ms' not in st.session_state:
+        st.session_state.cpu_ms = 0.0
+        st.session_state.script_runs = 0
+        st.session_state.session_start = time.time()
 
 def format_time(seconds):
     """Format seconds to MM:SS.mmm"""
@@ -105,13 +134,77 @@ def reset_stopwatch():
     st.session_state.running = False
     st.session_state.start_time = None
     st.session_state.elapsed_time = 0.0
-    if 'laps' in st.session_state:
-        st.session_state.laps = []
+    st.session_state.laps.clear()
+    st.session_state.lap_page = 1
 
-def main():
-    # Initialize session state
-    init_session_state()
-    
+def browser_timer_args():
+    """What the browser timer needs to count up on its own"""
+    running = st.session_state.running and st.session_state.start_time is not None
+    return {
+        "accumulated_ms": st.session_state.elapsed_time * 1000,
+        "start_ms": (st.session_state.start_time or 0) * 1000,
+        "running": bool(running),
+        # The server's clock at render time lets the page cancel out client clock skew
+        "server_now_ms": time.time() * 1000,
+    }
+
+def show_server_timer():
+    """Timer drawn by the server; only this fragment reruns while running"""
+    st.markdown(f'<div class="timer-display">{format_time(get_current_time())}</div>', unsafe_allow_html=True)
+
+def metered(fn):
+    """
+    Wrap fn so the CPU time of each call is charged to this session.
+    Only the outermost metered call charges: a fragment body run as part of a
+    full script run is already counted by the page's meter.
+    """
+    @functools.wraps(fn)
+    def run():
+        if getattr(_meter, "active", False):
+            return fn()
+        _meter.active = True
+        t0 = time.thread_time()  # Streamlit runs each session's script on its own thread
+        try:
+            return fn()
+        finally:
+            _meter.active = False
+            st.session_state.cpu_ms += (time.thread_time() - t0) * 1000
+            st.session_state.script_runs += 1
+    return run
+
+def show_cpu_usage():
+    """Server CPU spent on this session, from per-thread CPU time of every script/fragment run"""
+    wall = max(time.time() - st.session_state.session_start, 1e-6)
+    cpu_ms = st.session_state.cpu_ms
+    with st.expander("Server cost for this session"):
+        st.markdown(f"**CPU:** {cpu_ms:.1f} ms over {wall:.0f} s "
+                    f"({cpu_ms / wall / 10:.3f}% of one core) · **Runs:** {st.session_state.script_runs}")
+        st.caption("The old 10 ms rerun loop ran the whole script ~100 times per second while running.")
+
+def show_laps(laps):
+    """Lap stats (kept incrementally by LapLog) and one page of the lap table, newest first"""
+    st.subheader(f"Lap Count: {len(laps)}")
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Fastest", format_time(laps.split[laps.fastest]), f"Lap {laps.fastest + 1}", delta_color="off")
+    col2.metric("Slowest", format_time(laps.split[laps.slowest]), f"Lap {laps.slowest + 1}", delta_color="off")
+    col3.metric("Mean", format_time(laps.mean))
+    col4.metric(f"Last {min(len(laps), laps.window)} avg", format_time(laps.rolling_mean))
+
+    pages = (len(laps) + LAP_PAGE_SIZE - 1) // LAP_PAGE_SIZE
+    if not 1 <= st.session_state.get('lap_page', 1) <= pages:
+        st.session_state.lap_page = 1
+    if pages > 1:
+        st.number_input(f"Page (of {pages}, newest first)", min_value=1, max_value=pages,
+                        key="lap_page", step=1)
+    numbers, splits, cumulative = laps.page(st.session_state.get('lap_page', 1) - 1, LAP_PAGE_SIZE)
+    rows = []
+    for number, split, cum in zip(numbers.tolist(), splits.tolist(), cumulative.tolist()):
+        tag = " 🟢" if number - 1 == laps.fastest else " 🔴" if number - 1 == laps.slowest else ""
+        rows.append(f'<div class="lap-item"><strong>Lap {number}</strong>{tag} · '
+                    f'split {format_time(split)} · total {format_time(cum)}</div>')
+    st.markdown("".join(rows), unsafe_allow_html=True)
+
+def render_stopwatch():
     st.title("⏱️ Simple Stopwatch")
     
     # Get current time
@@ -130,10 +223,12 @@ def main():
     
     st.markdown(f'<div style="text-align: center;"><div class="status-chip {status_class}">{status}</div></div>', unsafe_allow_html=True)
     
-    # Display timer - using a placeholder for dynamic updates
-    timer_placeholder = st.empty()
-    with timer_placeholder.container():
-        st.markdown(f'<div class="timer-display">{format_time(current_time)}</div>', unsafe_allow_html=True)
+    # Display timer
+    if st.session_state.display_mode == DISPLAY_MODES[0]:
+        _stopwatch_timer(timer=browser_timer_args(), key="browser_timer", default=None)
+    else:
+        refresh = FRAGMENT_REFRESH_S if st.session_state.running else None
+        st.fragment(run_every=refresh)(metered(show_server_timer))()
     
     # Control buttons
     col1, col2, col3 = st.columns(3)
@@ -155,21 +250,142 @@ def main():
     
     with col3:
         if st.button("📍 Lap", use_container_width=True, disabled=not st.session_state.running, key="lap_btn"):
-            if 'laps' not in st.session_state:
-                st.session_state.laps = []
-            st.session_state.laps.append(current_time)
+            st.session_state.laps.add(current_time)
+            st.session_state.lap_page = 1  # jump back to the newest lap
             st.rerun()
     
-    # Display lap count if any
-    if 'laps' in st.session_state and st.session_state.laps:
-        lap_count = len(st.session_state.laps)
-        st.subheader(f"Lap Count: {lap_count}")
-        st.markdown(f'<div class="lap-item"><strong>Total Laps Completed:</strong> {lap_count}</div>', unsafe_allow_html=True)
+    # Display lap analytics if any
+    if len(st.session_state.laps):
+        show_laps(st.session_state.laps)
     
-    # Auto-refresh when running
-    if st.session_state.running:
-        time.sleep(0.01)  # Small delay
-        st.rerun()
+    st.radio("Display", DISPLAY_MODES, key="display_mode", horizontal=True)
+    show_cpu_usage()
+
+def get_race():
+    """The race timers for this session"""
+    if 'race' not in st.session_state:
+        st.session_state.race = RaceTimers()
+    return st.session_state.race
+
+def parse_bibs(text):
+    """Bib numbers from free text such as '101, 102 117'"""
+    tokens = text.replace(",", " ").split()
+    if not all(t.isdigit() for t in tokens):
+        raise ValueError("Bib numbers must be whole numbers")
+    bibs = [int(t) for t in tokens]
+    if any(b > MAX_BIB for b in bibs):
+        raise ValueError(f"Bib numbers must be at most {MAX_BIB:,}")
+    return bibs
+
+def add_athletes(race, entries, numbered):
+    """Register 'bib, name' lines plus the next `numbered` unused bib numbers"""
+    bibs, names = [], []
+    for line in entries.splitlines():
+        if not line.strip():
+            continue
+        bib, _, name = line.partition(",")
+        bibs.extend(parse_bibs(bib))
+        names.append(name.strip() or f"Bib {bib.strip()}")
+    if len(bibs) != len(names):
+        raise ValueError("Use one 'bib, name' per line")
+    first = max([int(race.bibs[:len(race)].max()) if len(race) else 0] + bibs) + 1
+    if first + numbered - 1 > MAX_BIB:
+        raise ValueError(f"Bib numbers must be at most {MAX_BIB:,}")
+    bibs.extend(range(first, first + numbered))
+    names.extend(f"Bib {b}" for b in range(first, first + numbered))
+    race.add(bibs, names)
+    return len(bibs)
+
+def show_standings():
+    """Live standings; refreshed as a fragment while any timer is running"""
+    race = get_race()
+    table = to_seconds(race.standings())
+    table["elapsed"] = [format_time(v) for v in table.pop("elapsed_s")]
+    st.dataframe(table, hide_index=True, width="stretch",
+                 column_order=["rank", "bib", "name", "running", "elapsed", "laps", "best_split_s",
+                               "mean_split_s", "slowest_split_s", "last_lap_s"])
+
+def render_race():
+    st.title("🏁 Race Timer")
+    race = get_race()
+
+    with st.expander("Athletes", expanded=not len(race)):
+        with st.form("add_athletes", clear_on_submit=True):
+            entries = st.text_area("One athlete per line: bib, name", placeholder="101, Jane Doe\n102, Sam Lee")
+            numbered = st.number_input("Or add this many numbered bibs", min_value=0,
+                                       max_value=MAX_NUMBERED_BIBS, value=0)
+            if st.form_submit_button("Add athletes"):
+                try:
+                    st.success(f"Added {add_athletes(race, entries, int(numbered))} athletes")
+                except ValueError as e:
+                    st.error(str(e))
+
+    if not len(race):
+        st.info("Add athletes to start timing.")
+        return
+
+    # Bulk controls: one clock read per button, so a mass start is one instant for everyone
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        if st.button("▶️ Start all", width="stretch", key="race_start_all"):
+            race.start()
+    with col2:
+        if st.button("⏸️ Stop all", width="stretch", key="race_stop_all"):
+            race.stop()
+    with col3:
+        if st.button("🔄 Reset all", width="stretch", key="race_reset_all"):
+            race.reset()
+
+    with st.form("bib_action", clear_on_submit=True):
+        col1, col2 = st.columns([3, 1])
+        bib_text = col1.text_input("Bib numbers", placeholder="101 102 117")
+        action = col2.selectbox("Action", ["Lap", "Start", "Stop", "Reset"])
+        if st.form_submit_button("Apply"):
+            now = time.perf_counter_ns()
+            try:
+                bibs = parse_bibs(bib_text)
+                if action == "Lap":
+                    st.success(f"Lap recorded for {race.lap(bibs, now=now)} of {len(bibs)} bibs")
+                elif action == "Start":
+                    st.success(f"Started {race.start(bibs, now=now)} timers")
+                elif action == "Stop":
+                    st.success(f"Stopped {race.stop(bibs, now=now)} timers")
+                else:
+                    race.reset(bibs)
+                    st.success(f"Reset {len(bibs)} timers")
+            except (KeyError, ValueError) as e:
+                st.error(str(e).strip("'\""))
+
+    st.subheader("Standings")
+    refresh = RACE_REFRESH_S if race.running[:len(race)].any() else None
+    st.fragment(run_every=refresh)(metered(show_standings))()
+
+    splits = to_seconds(race.splits())
+    with st.expander(f"Splits ({race.n_laps} laps)"):
+        st.dataframe(splits, hide_index=True, width="stretch")
+
+    # Export
+    standings = to_seconds(race.standings())
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button("Standings CSV", table_to_csv(standings), file_name="race_standings.csv",
+                           mime="text/csv", width="stretch")
+        st.download_button("Splits CSV", table_to_csv(splits), file_name="race_splits.csv",
+                           mime="text/csv", width="stretch")
+    with col2:
+        try:
+            st.download_button("Standings Parquet", table_to_parquet(standings), file_name="race_standings.parquet",
+                               width="stretch")
+            st.download_button("Splits Parquet", table_to_parquet(splits), file_name="race_splits.parquet",
+                               width="stretch")
+        except ImportError:
+            st.caption("Install pandas and pyarrow for Parquet export.")
+
+def main():
+    # Initialize session state
+    init_session_state()
+    page = st.sidebar.radio("Mode", PAGES)
+    metered(render_stopwatch if page == PAGES[0] else render_race)()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -3,34 +3,64 @@
 # for the game loop, making it safe and stable.
 
 import streamlit as st
-from PIL import Image, ImageDraw, ImageFont, ImageFilter
+import streamlit.components.v1 as components
+from PIL import Image, ImageDraw
 import time
 import random
 import json
 import os
 import math
 import numpy as np
-import base64
 import io
 import threading
+import atexit
+import bisect
+import sqlite3
+from collections import deque
+from snake_engine import (
+    BADGE_THRESHOLDS, BASE_TICK_MS, LEVEL_UP_FOOD, MIN_TICK_MS,
+    REPLAY_MAX_TICKS, Autopilot, Replay, ReplayPlayer, ReplayRecorder, SnakeBody, advance, new_game, turn,
+)
 
 # -----------------------
 # Constants & Defaults
 # -----------------------
-HIGH_SCORE_FILE = ".snake_highscore.json"
+HIGH_SCORE_FILE = ".snake_highscore.json"  # legacy single score, imported once
+LEADERBOARD_DB = ".snake_leaderboard.sqlite3"
+LEADERBOARD_SIZE = 10  # scores kept per grid size + speed preset
+LEADERBOARD_FLUSH_SECS = 2.0  # write-behind delay; submissions inside it share one transaction
+REPLAYS_KEPT = 100  # most recent run replays kept in the leaderboard database
 DEFAULT_GRID = (20, 20)
 DEFAULT_CELL_DESKTOP = 24
 DEFAULT_CELL_MOBILE = 18
 MIN_TOUCH_TARGET = 44  # px
-LEVEL_UP_FOOD = 5
-BADGE_THRESHOLDS = [5, 10, 20]
-BASE_TICK_MS = 160  # normal speed
 SPEED_PRESETS = {
     "Slow": 240,
     "Normal": 160,
     "Fast": 100,
 }
+LOOP_MODES = ("Browser (client-side)", "Server (rerun per tick)")
 FONT_IMPORT = "https://fonts.googleapis.com/css2?family=Poppins:wght@400;500;600;700&display=swap"
+GRID_PRESETS = {
+    "Small 12×12": (12, 12),
+    "Default 20×20": DEFAULT_GRID,
+    "Large 28×28": (28, 28),
+    "Event 100×100": (100, 100),
+    "Stress 200×200": (200, 200),
+}
+BOARD_MAX_PX = 720  # longest side of the board image
+MIN_CELL_SIZE = 10  # below this the server image switches to a camera viewport
+MIN_CANVAS_CELL = 3  # browser canvases always draw the whole board
+# Tick budget (server loop, 60 ms minimum tick), from `bench_day15.py large`:
+# engine step ~0.02 ms and dirty-cell render ~1-2 ms p95 at any board size
+# (a 40×40-cell viewport on 100×100 and 200×200, fully redrawn only when
+# the camera recenters); RGBA PNG encoding of the 720 px view ~21 ms p95 and
+# up to ~35 ms, which "Palette PNG" and "Canvas diff" cut down. Typical ticks
+# (~24 ms p95 in total) fit, but the autopilot's full BFS replan costs up to
+# ~60 ms on 200×200 on its own, so a replan tick with an RGBA encode runs
+# over 60 ms and the next tick starts late (the tick-timing panel shows it as
+# lateness). Large boards keep the same tick_ms presets as 20×20; pick
+# "Canvas diff" there to keep encoding out of the budget.
 
 # -----------------------
 # Utility Functions
@@ -49,7 +79,7 @@ def now_ms():
 # State Initialization & Persistence
 # -----------------------
 def load_high_score():
-    """Attempt to read high score from disk. Return int or 0."""
+    """Read the legacy single high score file. Return int or 0."""
     try:
         if os.path.exists(HIGH_SCORE_FILE):
             with open(HIGH_SCORE_FILE, "r", encoding="utf-8") as f:
@@ -61,14 +91,167 @@ def load_high_score():
     return 0
 
 
-def save_high_score(value):
-    """Attempt to save high score to disk. Fails silently."""
-    try:
-        with open(HIGH_SCORE_FILE, "w", encoding="utf-8") as f:
-            json.dump({"high_score": int(value)}, f)
-    except Exception:
-        # silently ignore
-        pass
+class Leaderboard:
+    """
+    Top-N scores per (grid, speed) board, served from memory and persisted
+    write-behind to SQLite (WAL). submit() only touches memory and queues the
+    row; a background thread flushes the queue in one transaction a couple
+    of seconds later (and at exit), then trims each board to its top N.
+    Storage errors never reach the game: unflushed rows are retried later.
+    The same queue persists the most recent run replays (REPLAYS_KEPT).
+    """
+
+    def __init__(self, path=LEADERBOARD_DB, size=LEADERBOARD_SIZE, flush_secs=LEADERBOARD_FLUSH_SECS):
+        self.size = size
+        self.flush_secs = flush_secs
+        self._lock = threading.Lock()  # guards _top and _pending
+        self._db_lock = threading.Lock()
+        self._top = {}  # (grid, speed) -> [(-score, created_at), ...] best first
+        self._pending = []
+        self._pending_replays = []
+        self._wake = threading.Event()
+        self._conn = None
+        try:
+            self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+            with self._conn:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS scores ("
+                    " grid TEXT NOT NULL, speed TEXT NOT NULL, score INTEGER NOT NULL, created_at REAL NOT NULL)")
+                self._conn.execute("CREATE INDEX IF NOT EXISTS scores_board ON scores (grid, speed, score DESC)")
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS replays ("
+                    " grid TEXT NOT NULL, speed TEXT NOT NULL, score INTEGER NOT NULL, ticks INTEGER NOT NULL,"
+                    " created_at REAL NOT NULL, data BLOB NOT NULL)")
+                rows = self._conn.execute("SELECT grid, speed, score, created_at FROM scores").fetchall()
+        except sqlite3.Error:
+            rows = []  # memory-only for this process
+        for grid, speed, score, created in rows:
+            bisect.insort(self._top.setdefault((grid, speed), []), (-score, created))
+        if not rows:
+            legacy = load_high_score()
+            if legacy:
+                self.submit(board_key(DEFAULT_GRID, "Normal"), legacy)
+        for board in self._top:
+            del self._top[board][self.size:]
+        threading.Thread(target=self._writer, name="leaderboard-writer", daemon=True).start()
+        atexit.register(self.flush)
+
+    def best(self, board):
+        top = self._top.get(board)
+        return -top[0][0] if top else 0
+
+    def top(self, board, n=None):
+        """Scores for a board, best first."""
+        return [-neg for neg, _ in self._top.get(board, ())[:n or self.size]]
+
+    def submit(self, board, score):
+        """Record a finished run. Returns its 1-based rank, or None if it did not make the board."""
+        score = int(score)
+        if score <= 0:
+            return None
+        entry = (-score, time.time())
+        with self._lock:
+            top = self._top.setdefault(board, [])
+            if len(top) >= self.size and entry >= top[-1]:
+                return None
+            rank = bisect.bisect_left(top, entry)
+            top.insert(rank, entry)
+            del top[self.size:]
+            self._pending.append((board[0], board[1], score, entry[1]))
+        self._wake.set()
+        return rank + 1
+
+    def add_replay(self, board, replay):
+        """Queue a finished run's replay (a snake_engine.Replay) for the next flush."""
+        with self._lock:
+            self._pending_replays.append(
+                (board[0], board[1], replay.score, replay.ticks, time.time(), replay.to_bytes()))
+        self._wake.set()
+
+    def recent_replays(self, limit=20):
+        """(rowid, grid, speed, score, ticks, created_at) of stored replays, newest first."""
+        if self._conn is None:
+            return []
+        try:
+            with self._db_lock:
+                return self._conn.execute(
+                    "SELECT rowid, grid, speed, score, ticks, created_at FROM replays"
+                    " ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        except sqlite3.Error:
+            return []
+
+    def load_replay(self, rowid):
+        """Stored replay bytes, or None."""
+        try:
+            with self._db_lock:
+                row = self._conn.execute("SELECT data FROM replays WHERE rowid = ?", (rowid,)).fetchone()
+        except sqlite3.Error:
+            return None
+        return row[0] if row else None
+
+    def flush(self):
+        """Write queued scores and replays in one transaction and trim the touched boards."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            replays, self._pending_replays = self._pending_replays, []
+        if not (pending or replays) or self._conn is None:
+            return
+        try:
+            with self._db_lock, self._conn:
+                self._conn.executemany(
+                    "INSERT INTO scores (grid, speed, score, created_at) VALUES (?, ?, ?, ?)", pending)
+                if replays:
+                    self._conn.executemany(
+                        "INSERT INTO replays (grid, speed, score, ticks, created_at, data)"
+                        " VALUES (?, ?, ?, ?, ?, ?)", replays)
+                    self._conn.execute(
+                        "DELETE FROM replays WHERE rowid NOT IN ("
+                        " SELECT rowid FROM replays ORDER BY created_at DESC LIMIT ?)", (REPLAYS_KEPT,))
+                for grid, speed in {(g, sp) for g, sp, _, _ in pending}:
+                    self._conn.execute(
+                        "DELETE FROM scores WHERE grid = ? AND speed = ? AND rowid NOT IN ("
+                        " SELECT rowid FROM scores WHERE grid = ? AND speed = ?"
+                        " ORDER BY score DESC, created_at LIMIT ?)",
+                        (grid, speed, grid, speed, self.size))
+        except sqlite3.Error:
+            with self._lock:
+                self._pending[:0] = pending  # keep them for the next flush
+                self._pending_replays[:0] = replays
+
+    def _writer(self):
+        while True:
+            self._wake.wait()
+            time.sleep(self.flush_secs)  # coalesce bursts into one write
+            self._wake.clear()
+            self.flush()
+
+
+def board_key(grid_size, speed_preset):
+    """Leaderboards are kept per grid size and speed preset."""
+    return f"{grid_size[0]}x{grid_size[1]}", speed_preset
+
+
+@st.cache_resource(show_spinner=False)
+def get_leaderboard():
+    """One leaderboard per server process, shared by all sessions."""
+    return Leaderboard()
+
+
+def record_run(ss):
+    """Submit a finished run's score (and replay, if recorded) once; called when game_over flips."""
+    if ss.get("run_recorded"):
+        return
+    ss["run_recorded"] = True
+    board = board_key(ss["grid_size"], ss["speed_preset"])
+    leaderboard = get_leaderboard()
+    leaderboard.submit(board, ss["score"])
+    recorder = ss.get("recorder")
+    if recorder is not None and 0 < recorder.replay.ticks <= REPLAY_MAX_TICKS:
+        replay = recorder.finish(ss["score"])
+        ss["last_replay"] = replay.to_bytes()
+        leaderboard.add_replay(board, replay)
+    ss["recorder"] = None
 
 
 def init_state():
@@ -76,18 +259,26 @@ def init_state():
     ss = st.session_state
     ss.setdefault("grid_size", DEFAULT_GRID)  # (rows, cols)
     ss.setdefault("cell_size", DEFAULT_CELL_DESKTOP)
+    ss.setdefault("viewport", None)  # (rows, cols) camera window for large boards
     ss.setdefault("snake", None)
+    ss.setdefault("free_cells", None)
     ss.setdefault("direction", (0, 1))  # moving right initially (dr, dc)
     ss.setdefault("next_direction", (0, 1))
     ss.setdefault("food_pos", None)
     ss.setdefault("score", 0)
-    ss.setdefault("high_score", load_high_score())
+    ss.setdefault("high_score", 0)  # best for the current board, see main()
+    ss.setdefault("speed_preset", "Normal")
+    ss.setdefault("run_recorded", False)
+    ss.setdefault("recorder", None)  # ReplayRecorder for the server-loop run in progress
+    ss.setdefault("last_replay", None)  # bytes of the last finished run
     ss.setdefault("level", 1)
     ss.setdefault("running", False)
     ss.setdefault("game_over", False)
+    ss.setdefault("won", False)
     ss.setdefault("tick_ms", BASE_TICK_MS)
     ss.setdefault("last_update_ts", now_ms())
-    ss.setdefault("rng_state", None)
+    ss.setdefault("seed", None)
+    ss.setdefault("rng_state", None)  # random.Random for this run, see _session_rng
     ss.setdefault("sound_on", True)
     ss.setdefault("achievement_badges", set())
     ss.setdefault("steps", 0)
@@ -95,200 +286,472 @@ def init_state():
     ss.setdefault("streak", 0)
     ss.setdefault("confetti_frame", 0)
     ss.setdefault("auto_focus_key", 0)  # used to force focus in component
+    ss.setdefault("loop_mode", LOOP_MODES[0])
+    ss.setdefault("frame_mode", FRAME_MODES[0])
+    ss.setdefault("autopilot", False)
+    ss.setdefault("client_seen", set())  # seq ids of handled client events
     # For simple audio playback via HTML component: store base64 or None
     ss.setdefault("eat_sound_b64", _embed_default_eat_sound_b64())
     ss.setdefault("death_sound_b64", _embed_default_death_sound_b64())
 
 
+def _session_rng(ss):
+    """
+    The session's random.Random. Seeded from ss["seed"] at reset, so a run
+    can be reproduced headlessly with snake_engine and the same seed.
+    """
+    rng = ss.get("rng_state")
+    if not isinstance(rng, random.Random):
+        rng = ss["rng_state"] = random.Random(ss.get("seed"))
+    return rng
+
+
 def reset_game(preserve_high_score=True):
     """Reset the run-specific state but preserve high score if requested."""
     ss = st.session_state
-    rows, cols = ss["grid_size"]
-    mid_r, mid_c = rows // 2, cols // 2
-    initial_snake = [(mid_r, mid_c - i) for i in range(3)][::-1]  # head at end
-    ss["snake"] = initial_snake[:]  # list of (r, c)
-    ss["direction"] = (0, 1)
-    ss["next_direction"] = (0, 1)
-    ss["food_pos"] = place_food(initial_snake, ss["grid_size"])
-    ss["score"] = 0
-    ss["level"] = 1
+    ss["seed"] = random.getrandbits(64)
+    ss["rng_state"] = random.Random(ss["seed"])
+    ss.update(new_game(ss["grid_size"], ss["rng_state"]))
+    ss["recorder"] = ReplayRecorder(ss["grid_size"], ss["seed"])
     ss["running"] = False
-    ss["game_over"] = False
-    ss["tick_ms"] = BASE_TICK_MS
     ss["last_update_ts"] = now_ms()
-    ss["steps"] = 0
     ss["pulse_frame"] = 0
-    ss["streak"] = 0
     ss["confetti_frame"] = 0
-    ss["achievement_badges"] = set()
-    if preserve_high_score:
-        ss.setdefault("high_score", load_high_score())
-    else:
+    ss["run_recorded"] = False
+    if not preserve_high_score:
         ss["high_score"] = 0
 
 
 # -----------------------
 # Game Logic
 # -----------------------
-def place_food(snake, grid_size):
-    """Place food at random free cell."""
-    rows, cols = grid_size
-    occupied = set(snake)
-    free = [(r, c) for r in range(rows) for c in range(cols) if (r, c) not in occupied]
-    if not free:
-        return None
-    return random.choice(free)
-
-
 def step():
     """Advance the game one tick. Returns dict with 'ate', 'collision' flags."""
     ss = st.session_state
-    if ss["game_over"]:
-        return {"ate": False, "collision": True}
-
-    snake = ss["snake"]
-    dirr = ss["direction"]
-    head = snake[-1]
-    new_head = (head[0] + dirr[0], head[1] + dirr[1])
-    rows, cols = ss["grid_size"]
-
-    # wall collision
-    if not (0 <= new_head[0] < rows and 0 <= new_head[1] < cols):
-        ss["game_over"] = True
-        ss["running"] = False
-        return {"ate": False, "collision": True}
-
-    # self collision
-    if new_head in snake:
-        ss["game_over"] = True
-        ss["running"] = False
-        return {"ate": False, "collision": True}
-
-    ate = False
-    if new_head == ss["food_pos"]:
-        ate = True
-        snake.append(new_head)  # grow
-        ss["score"] += 1
-        ss["steps"] += 1
-        ss["streak"] += 1
-        # place new food
-        ss["food_pos"] = place_food(snake, ss["grid_size"])
-        # level up every LEVEL_UP_FOOD
-        new_level = 1 + (ss["score"] // LEVEL_UP_FOOD)
-        if new_level != ss["level"]:
-            ss["level"] = new_level
-            # speed up slightly but clamp minimum tick
-            ss["tick_ms"] = max(60, int(ss["tick_ms"] * 0.92))
-            ss["confetti_frame"] = 6  # show confetti for a few frames
-        # badges
-        for t in BADGE_THRESHOLDS:
-            if ss["score"] >= t:
-                ss["achievement_badges"].add(t)
-    else:
-        # move normally: pop head, push new head
-        snake.pop(0)
-        snake.append(new_head)
-        ss["steps"] += 1
-        ss["streak"] = 0  # reset streak on non-food move
-
-    # update high score
+    recorder = ss.get("recorder")
+    if recorder is not None and not ss["game_over"]:
+        recorder.record(ss["next_direction"])  # the direction advance() is about to apply
+    result = advance(ss, _session_rng(ss))
+    if result["level_up"]:
+        ss["confetti_frame"] = 6  # show confetti for a few frames
+
+    # update high score in memory; the leaderboard gets the run once it ends
     if ss["score"] > ss.get("high_score", 0):
         ss["high_score"] = ss["score"]
-        try:
-            save_high_score(ss["high_score"])
-        except Exception:
-            pass
+    if ss["game_over"]:
+        record_run(ss)
 
     # pulse frame increment
-    ss["pulse_frame"] = (ss["pulse_frame"] + 1) % 30
-    return {"ate": ate, "collision": False}
+    if not result["collision"]:
+        ss["pulse_frame"] = (ss["pulse_frame"] + 1) % 30
+    return result
 
 
 # -----------------------
 # Rendering
 # -----------------------
-def draw_board(grid_size, snake, food_pos, cell_size=24, pulse_frame=0, confetti=False):
+SNAKE_GRAD_START = (36, 180, 100)
+SNAKE_GRAD_END = (14, 102, 71)
+PALETTE_STEPS = 16  # gradient runs start -> end -> start over 2 * (steps - 1) segments
+BOARD_BG = (14, 17, 23, 255)
+GRID_LINE = (18, 23, 29, 255)
+
+
+WALL_EDGE = (239, 68, 68, 255)
+
+
+@st.cache_resource(show_spinner=False)
+def _static_layer(grid_size, cell_size, walls=()):
     """
-    Draw the board to a PIL image and return it (RGBA).
-    - rounded snake segments, brighter head, subtle grid lines.
-    - pulsing food effect: alternate food color/brightness using pulse_frame.
-    - confetti: if True, overlay emoji-like colored circles for one frame.
+    Background and soft grid lines for one board geometry. Shared; never drawn on.
+    walls: edges ("top", "left", "bottom", "right") to mark as board walls,
+    for viewports that do not show the whole board.
     """
     rows, cols = grid_size
     width = cols * cell_size
     height = rows * cell_size
-
-    # Create base image
-    img = Image.new("RGBA", (width, height), (14, 17, 23, 255))
+    img = Image.new("RGBA", (width, height), BOARD_BG)
     draw = ImageDraw.Draw(img)
-
-    # soft grid lines
-    line_color = (18, 23, 29, 255)
     for r in range(rows + 1):
         y = r * cell_size + 0.5
-        draw.line([(0, y), (width, y)], fill=line_color, width=1)
+        draw.line([(0, y), (width, y)], fill=GRID_LINE, width=1)
     for c in range(cols + 1):
         x = c * cell_size + 0.5
-        draw.line([(x, 0), (x, height)], fill=line_color, width=1)
-
-    # snake body gradient greens
-    if snake:
-        grad_start = np.array([36, 180, 100])
-        grad_end = np.array([14, 102, 71])
-        L = len(snake)
-        for i, (r, c) in enumerate(snake):
-            t = i / max(1, L - 1)
-            color = tuple((grad_start * (1 - t) + grad_end * t).astype(int)) + (255,)
-            x0 = c * cell_size + 2
-            y0 = r * cell_size + 2
-            x1 = (c + 1) * cell_size - 2
-            y1 = (r + 1) * cell_size - 2
-            # rounded rectangle (ellipse corners)
-            draw.rounded_rectangle([x0, y0, x1, y1], radius=int(cell_size / 4), fill=color)
-
-        # head highlight
-        head = snake[-1]
-        hx0 = head[1] * cell_size + 1
-        hy0 = head[0] * cell_size + 1
-        hx1 = (head[1] + 1) * cell_size - 1
-        hy1 = (head[0] + 1) * cell_size - 1
-        draw.rounded_rectangle([hx0, hy0, hx1, hy1], radius=int(cell_size / 3),
-                               fill=(76, 255, 169, 255), outline=(255, 255, 255, 80), width=2)
-
-    # pulsing food
-    if food_pos:
-        fr, fc = food_pos
-        pulse = (math.sin(pulse_frame / 3.0) + 1) / 2.0  # 0..1
-        amber = (245, 158, 11)
-        amber_glow = (255, 199, 79)
-        color = tuple(int(amber[i] * (1 - pulse) + amber_glow[i] * pulse) for i in range(3)) + (255,)
-        x0 = fc * cell_size + 3
-        y0 = fr * cell_size + 3
-        x1 = (fc + 1) * cell_size - 3
-        y1 = (fr + 1) * cell_size - 3
-        draw.ellipse([x0, y0, x1, y1], fill=color)
-        # small sparkle
-        sx = (fc + 0.35) * cell_size
-        sy = (fr + 0.25) * cell_size
-        draw.ellipse([sx, sy, sx + cell_size * 0.12, sy + cell_size * 0.12], fill=(255, 230, 170, 220))
-
-    # confetti
-    if confetti:
+        draw.line([(x, 0), (x, height)], fill=GRID_LINE, width=1)
+    edges = {"top": [(0, 0), (width, 0)], "left": [(0, 0), (0, height)],
+             "bottom": [(0, height - 1), (width, height - 1)], "right": [(width - 1, 0), (width - 1, height)]}
+    for wall in walls:
+        draw.line(edges[wall], fill=WALL_EDGE, width=3)
+    return img
+
+
+def _sprite(cell_size):
+    return Image.new("RGBA", (cell_size, cell_size), (0, 0, 0, 0))
+
+
+@st.cache_resource(show_spinner=False)
+def _segment_sprites(cell_size):
+    """Pre-rendered rounded segments for the gradient palette, plus the head."""
+    start, end = np.array(SNAKE_GRAD_START), np.array(SNAKE_GRAD_END)
+    ramp = list(range(PALETTE_STEPS)) + list(range(PALETTE_STEPS - 2, 0, -1))  # ping-pong
+    body = []
+    for k in ramp:
+        t = k / max(1, PALETTE_STEPS - 1)
+        color = tuple((start * (1 - t) + end * t).astype(int)) + (255,)
+        spr = _sprite(cell_size)
+        ImageDraw.Draw(spr).rounded_rectangle([2, 2, cell_size - 2, cell_size - 2],
+                                              radius=int(cell_size / 4), fill=color)
+        body.append(spr)
+    head = _sprite(cell_size)
+    ImageDraw.Draw(head).rounded_rectangle([1, 1, cell_size - 1, cell_size - 1], radius=int(cell_size / 3),
+                                           fill=(76, 255, 169, 255), outline=(255, 255, 255, 80), width=2)
+    return body, head
+
+
+@st.cache_resource(show_spinner=False)
+def _food_sprite(cell_size, pulse_frame):
+    """Pulsing food: alternate food color/brightness using pulse_frame (30 distinct frames)."""
+    pulse = (math.sin(pulse_frame / 3.0) + 1) / 2.0  # 0..1
+    amber = (245, 158, 11)
+    amber_glow = (255, 199, 79)
+    color = tuple(int(amber[i] * (1 - pulse) + amber_glow[i] * pulse) for i in range(3)) + (255,)
+    spr = _sprite(cell_size)
+    draw = ImageDraw.Draw(spr)
+    draw.ellipse([3, 3, cell_size - 3, cell_size - 3], fill=color)
+    # small sparkle
+    sx, sy = 0.35 * cell_size, 0.25 * cell_size
+    draw.ellipse([sx, sy, sx + cell_size * 0.12, sy + cell_size * 0.12], fill=(255, 230, 170, 220))
+    return spr
+
+
+class BoardRenderer:
+    """
+    Per-session board renderer. Keeps the last frame and, when the snake moved
+    by a single step, redraws only the dirty cells (new head, old head, old
+    tail, food) from cached sprites, so frame time does not grow with the
+    snake. Anything else (reset, resize, skipped steps) triggers a full redraw.
+    Segment colors are fixed when a segment is created, so they never need
+    repainting as the snake moves.
+    """
+
+    def __init__(self, grid_size, cell_size):
+        self.grid_size = tuple(grid_size)
+        self.cell_size = cell_size
+        self.frame = None
+        self._head = self._tail = self._food = None
+        self._len = 0
+        self._serial = 0  # palette serial of the current head segment
+        self.dirty_cells = 0  # cells repainted by the last render, for benchmarking
+
+    def _box(self, cell):
+        return (cell[1] * self.cell_size, cell[0] * self.cell_size)
+
+    def _background(self):
+        return _static_layer(self.grid_size, self.cell_size)
+
+    def _clear(self, cell):
+        x, y = self._box(cell)
+        cs = self.cell_size
+        self.frame.paste(self._background().crop((x, y, x + cs, y + cs)), (x, y))
+
+    def _put(self, cell, sprite):
+        self._clear(cell)
+        self.frame.alpha_composite(sprite, dest=self._box(cell))
+
+    def _body_sprite(self, serial):
+        body, _ = _segment_sprites(self.cell_size)
+        return body[serial % len(body)]
+
+    def _full_redraw(self, snake, food_pos, pulse_frame):
+        self.frame = self._background().copy()
+        self.dirty_cells = len(snake) + 1
+        n = len(snake)
+        for i, cell in enumerate(snake):
+            if i < n - 1:
+                self.frame.alpha_composite(self._body_sprite(i), dest=self._box(cell))
+        self._serial = n - 1
+        if n:
+            self.frame.alpha_composite(_segment_sprites(self.cell_size)[1], dest=self._box(snake[-1]))
+        if food_pos:
+            self.frame.alpha_composite(_food_sprite(self.cell_size, pulse_frame), dest=self._box(food_pos))
+
+    def _diff(self, snake):
+        """'same', 'step' (advanced or grew by exactly one cell) or None (needs a full redraw)."""
+        if self.frame is None or self._head is None or len(snake) < 2:
+            return None
+        grew = len(snake) - self._len
+        if grew == 0 and snake[-1] == self._head and snake[0] == self._tail:
+            return "same"
+        if grew not in (0, 1) or snake[-2] != self._head:
+            return None
+        if (snake[0] == self._tail) if grew else (self._tail not in snake):
+            return "step"
+        return None
+
+    def render(self, snake, food_pos, pulse_frame=0, confetti=False):
+        diff = self._diff(snake)
+        if diff is None:
+            self._full_redraw(snake, food_pos, pulse_frame)
+        else:
+            self.dirty_cells = 0
+            if self._food and self._food != food_pos and self._food not in snake:
+                self._clear(self._food)
+                self.dirty_cells += 1
+            if diff == "step":
+                if snake[0] != self._tail:
+                    self._clear(self._tail)
+                    self.dirty_cells += 1
+                self._put(self._head, self._body_sprite(self._serial))
+                self._serial += 1
+                self._put(snake[-1], _segment_sprites(self.cell_size)[1])
+                self.dirty_cells += 2
+            if food_pos:
+                self._put(food_pos, _food_sprite(self.cell_size, pulse_frame))
+                self.dirty_cells += 1
+        self._head = snake[-1] if len(snake) else None
+        self._tail = snake[0] if len(snake) else None
+        self._len = len(snake)
+        self._food = food_pos
+
+        if not confetti:
+            return self.frame
+        # confetti goes on a copy so it never sticks to the persistent frame
+        img = self.frame.copy()
+        draw = ImageDraw.Draw(img)
+        width, height = img.size
         for i in range(12):
             rx = random.randint(0, width)
             ry = random.randint(0, height)
-            rr = random.randint(3, max(4, cell_size // 3))
+            rr = random.randint(3, max(4, self.cell_size // 3))
             color = tuple([random.randint(120, 255) for _ in range(3)]) + (220,)
             draw.ellipse([rx - rr, ry - rr, rx + rr, ry + rr], fill=color)
+        return img
 
-    # subtle vignette
-    vign = Image.new("RGBA", (width, height), (0, 0, 0, 0))
-    vdraw = ImageDraw.Draw(vign)
-    vdraw.rectangle([0, 0, width, height], fill=(0, 0, 0, 0))
-    # composite
-    img = Image.alpha_composite(img, vign)
 
-    return img
+class ViewportRenderer(BoardRenderer):
+    """
+    BoardRenderer for boards too big to show whole: draws a view-sized
+    window (the camera) and keeps the same dirty-cell updates for cells inside
+    it. The camera recenters on the head only when the head gets within a
+    quarter view of the window edge, so most ticks stay incremental; a move
+    costs one redraw of the visible cells. Board walls in view get a red edge.
+    """
+
+    def __init__(self, grid_size, cell_size, view):
+        super().__init__(grid_size, cell_size)
+        self.view = tuple(view)
+        self.origin = None  # (row, col) of the top-left visible cell
+
+    def _follow(self, head):
+        """Move the camera if the head left the inner area. Returns True if it moved."""
+        origin = []
+        for axis in (0, 1):
+            size, span = self.grid_size[axis], self.view[axis]
+            lo = self.origin[axis] if self.origin else -span
+            margin = span // 4
+            if not (lo + margin <= head[axis] < lo + span - margin):
+                lo = head[axis] - span // 2
+            origin.append(clamp(lo, 0, max(0, size - span)))
+        moved = tuple(origin) != self.origin
+        self.origin = tuple(origin)
+        return moved
+
+    def _visible(self, cell):
+        r, c = cell[0] - self.origin[0], cell[1] - self.origin[1]
+        return 0 <= r < self.view[0] and 0 <= c < self.view[1]
+
+    def _box(self, cell):
+        return ((cell[1] - self.origin[1]) * self.cell_size, (cell[0] - self.origin[0]) * self.cell_size)
+
+    def _background(self):
+        walls = []
+        if self.origin[0] == 0:
+            walls.append("top")
+        if self.origin[1] == 0:
+            walls.append("left")
+        if self.origin[0] + self.view[0] >= self.grid_size[0]:
+            walls.append("bottom")
+        if self.origin[1] + self.view[1] >= self.grid_size[1]:
+            walls.append("right")
+        return _static_layer(self.view, self.cell_size, tuple(walls))
+
+    def _clear(self, cell):
+        if self._visible(cell):
+            super()._clear(cell)
+
+    def _put(self, cell, sprite):
+        if self._visible(cell):
+            super()._put(cell, sprite)
+
+    def _full_redraw(self, snake, food_pos, pulse_frame):
+        self.frame = self._background().copy()
+        n = len(snake)
+        self.dirty_cells = 0
+        for i, cell in enumerate(snake):
+            if i < n - 1 and self._visible(cell):
+                self.frame.alpha_composite(self._body_sprite(i), dest=self._box(cell))
+                self.dirty_cells += 1
+        self._serial = n - 1
+        if n and self._visible(snake[-1]):
+            self.frame.alpha_composite(_segment_sprites(self.cell_size)[1], dest=self._box(snake[-1]))
+        if food_pos and self._visible(food_pos):
+            self.frame.alpha_composite(_food_sprite(self.cell_size, pulse_frame), dest=self._box(food_pos))
+
+    def render(self, snake, food_pos, pulse_frame=0, confetti=False):
+        if len(snake) and self._follow(snake[-1]):
+            self.frame = None  # camera moved: the next render redraws the view
+        return super().render(snake, food_pos, pulse_frame, confetti)
+
+
+def board_layout(grid_size):
+    """
+    (cell_size, viewport) for the server-rendered board. Boards up to 28×28
+    keep their old cell sizes; bigger boards shrink cells to fit BOARD_MAX_PX
+    down to MIN_CELL_SIZE, and beyond that show a camera viewport of
+    BOARD_MAX_PX // DEFAULT_CELL_MOBILE cells (viewport is None otherwise).
+    """
+    rows, cols = grid_size
+    if rows * cols < 28 * 28:
+        return DEFAULT_CELL_DESKTOP, None
+    cell = clamp(BOARD_MAX_PX // max(rows, cols), MIN_CELL_SIZE, DEFAULT_CELL_MOBILE)
+    if max(rows, cols) * cell <= BOARD_MAX_PX:
+        return cell, None
+    span = BOARD_MAX_PX // DEFAULT_CELL_MOBILE
+    return DEFAULT_CELL_MOBILE, (min(rows, span), min(cols, span))
+
+
+def canvas_cell_size(grid_size, cell_size):
+    """Cell size for browser canvases, which draw the whole board."""
+    return max(MIN_CANVAS_CELL, min(cell_size, BOARD_MAX_PX // max(grid_size)))
+
+
+def get_board_renderer(grid_size, cell_size, view=None):
+    """The session's renderer, recreated when the board geometry changes."""
+    ss = st.session_state
+    renderer = ss.get("board_renderer")
+    if (renderer is None or renderer.grid_size != tuple(grid_size) or renderer.cell_size != cell_size
+            or getattr(renderer, "view", None) != (tuple(view) if view else None)):
+        if view:
+            renderer = ViewportRenderer(grid_size, cell_size, view)
+        else:
+            renderer = BoardRenderer(grid_size, cell_size)
+        ss["board_renderer"] = renderer
+    return renderer
+
+
+def draw_board(grid_size, snake, food_pos, cell_size=24, pulse_frame=0, confetti=False):
+    """
+    Draw the board to a PIL image and return it (RGBA), from scratch.
+    - rounded snake segments, brighter head, subtle grid lines.
+    - pulsing food effect: alternate food color/brightness using pulse_frame.
+    - confetti: if True, overlay emoji-like colored circles for one frame.
+    The game itself uses a session BoardRenderer, which only redraws dirty cells.
+    """
+    return BoardRenderer(grid_size, cell_size).render(snake, food_pos, pulse_frame, confetti)
+
+
+# -----------------------
+# Frame Transport
+# -----------------------
+# How a server-rendered frame reaches the browser. "PNG (RGBA)" is what
+# st.image(img) always did; "Palette PNG" quantizes to a small palette first;
+# "Canvas diff" ships only the cells pushed at the head / popped from the tail
+# and lets snake_canvas/index.html paint them.
+FRAME_MODES = ("PNG (RGBA)", "Palette PNG", "Canvas diff")
+PALETTE_COLORS = 64
+KEYFRAME_EVERY = 300  # frames between full canvas bodies, as a safety net
+FRAME_STATS_SAMPLES = 120
+
+_snake_canvas = components.declare_component(
+    "snake_canvas", path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "snake_canvas"))
+
+
+def encode_png(img, palette=False):
+    """PNG bytes for a board frame, optionally quantized to PALETTE_COLORS colors."""
+    if palette:
+        img = img.convert("RGB").quantize(PALETTE_COLORS, method=Image.Quantize.FASTOCTREE)
+    bio = io.BytesIO()
+    img.save(bio, format="PNG")
+    return bio.getvalue()
+
+
+def canvas_frame(ss, snake, food_pos):
+    """
+    Next frame for the canvas component: a diff against the last frame sent
+    to this session, or a keyframe when the body cannot be expressed as
+    "pop k from the tail, push cells at the head" (reset, resync, geometry).
+    """
+    rows, cols = ss["grid_size"]
+    ids = [r * cols + c for r, c in snake]
+    prev = ss.get("canvas_sent")
+    frame = ss.get("canvas_frame", 0) + 1
+    payload = {"frame": frame, "food": food_pos[0] * cols + food_pos[1] if food_pos else -1,
+               "pulse": ss["pulse_frame"]}
+    pop = None
+    cell = canvas_cell_size(ss["grid_size"], ss["cell_size"])
+    geometry = (rows, cols, cell)
+    if prev is not None and ss.get("canvas_geometry") == geometry and frame % KEYFRAME_EVERY:
+        # the body only ever shifts towards the head, so matching both ends is enough
+        for k in range(min(len(prev), 3)):
+            n_kept = len(prev) - k
+            if ids and n_kept <= len(ids) and ids[0] == prev[k] and ids[n_kept - 1] == prev[-1]:
+                pop = k
+                break
+    if pop is None:
+        payload.update(body=ids, grid=[rows, cols], cell=cell)
+    else:
+        payload.update(base=frame - 1, pop=pop, push=ids[len(prev) - pop:])
+    ss["canvas_sent"] = ids
+    ss["canvas_frame"] = frame
+    ss["canvas_geometry"] = geometry
+    return payload
+
+
+def _record_frame(mode, render_ms, encode_ms, nbytes):
+    """Keep the last FRAME_STATS_SAMPLES frames' costs for the transport readout."""
+    stats = st.session_state.setdefault("frame_stats", deque(maxlen=FRAME_STATS_SAMPLES))
+    stats.append((mode, render_ms, encode_ms, nbytes))
+
+
+def _frame_stats_caption(mode):
+    samples = [s for s in st.session_state.get("frame_stats", ()) if s[0] == mode]
+    if not samples:
+        return "No frames yet"
+    n = len(samples)
+    render = sum(s[1] for s in samples) / n
+    encode = sum(s[2] for s in samples) / n
+    kb = sum(s[3] for s in samples) / n / 1024
+    return f"{mode}: render {render:.2f} ms · encode {encode:.2f} ms · {kb:.2f} KB/frame (last {n})"
+
+
+def show_frame(board_box, ss):
+    """Render the board for the server loop and ship it with the selected transport."""
+    mode = ss["frame_mode"]
+    t0 = time.perf_counter()
+    if mode == "Canvas diff":
+        resync = ss.get("canvas_resync")
+        if resync and resync.get("resync") != ss.get("canvas_resync_seen"):
+            ss["canvas_resync_seen"] = resync.get("resync")
+            ss["canvas_sent"] = None  # the iframe lost our frames: send a keyframe
+        payload = canvas_frame(ss, ss["snake"], ss["food_pos"])
+        render_ms = (time.perf_counter() - t0) * 1000
+        t1 = time.perf_counter()
+        nbytes = len(json.dumps(payload, separators=(",", ":")))
+        encode_ms = (time.perf_counter() - t1) * 1000
+        with board_box.container():
+            ss["canvas_resync"] = _snake_canvas(frame=payload, key="snake_canvas", default=None)
+    else:
+        renderer = get_board_renderer(ss["grid_size"], ss["cell_size"], ss.get("viewport"))
+        img = renderer.render(ss["snake"], ss["food_pos"], pulse_frame=ss["pulse_frame"])
+        render_ms = (time.perf_counter() - t0) * 1000
+        t1 = time.perf_counter()
+        data = encode_png(img, palette=mode == "Palette PNG")
+        encode_ms = (time.perf_counter() - t1) * 1000
+        nbytes = len(data)
+        board_box.image(data, use_container_width=False)
+    _record_frame(mode, render_ms, encode_ms, nbytes)
+    _phase("render_ms", render_ms)
+    _phase("encode_ms", encode_ms)
 
 
 # -----------------------
@@ -313,15 +776,11 @@ def handle_direction_input(key_char):
 
     if mapping[char] == "TOGGLE":
         ss["running"] = not ss["running"]
+        ss["last_update_ts"] = now_ms()  # the tick schedule restarts on play
         ss["auto_focus_key"] += 1
         return
 
-    nd = mapping[char]
-    # prevent 180-degree reversal if length > 1
-    cur = ss["direction"]
-    if len(ss["snake"]) > 1 and (nd[0] == -cur[0] and nd[1] == -cur[1]):
-        return
-    ss["next_direction"] = nd
+    turn(ss, mapping[char])
 
 
 # -----------------------
@@ -463,6 +922,138 @@ def _keyboard_input_component(key="snake_input", auto_focus_key=0):
     """
     st.components.v1.html(html, height=1)
 
+# -----------------------
+# Tick Timing
+# -----------------------
+# One row per server-loop tick: how late the tick fired against its schedule
+# and where the time went. Phases of a row belong to the script run that
+# executed the tick: the rerun that started it, the frame it drew, then
+# autopilot + step.
+TICK_TIMING_SAMPLES = 2048
+TICK_FIELDS = ("tick", "tick_ms", "late_ms", "rerun_ms", "render_ms", "encode_ms",
+               "autopilot_ms", "step_ms", "script_ms")
+TICK_PHASES = ("late_ms", "rerun_ms", "render_ms", "encode_ms", "autopilot_ms", "step_ms", "script_ms")
+TICK_HIST_BINS = 20
+
+
+class TickTimings:
+    """Fixed-size ring buffer of TICK_FIELDS rows (NaN = not measured), oldest overwritten first."""
+
+    def __init__(self, capacity=TICK_TIMING_SAMPLES):
+        self.capacity = capacity
+        self.rows = np.full((capacity, len(TICK_FIELDS)), np.nan)
+        self.count = 0
+        self._col = {name: i for i, name in enumerate(TICK_FIELDS)}
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, **values):
+        row = self.rows[self.count % self.capacity]
+        row.fill(np.nan)
+        for name, value in values.items():
+            row[self._col[name]] = value
+        self.count += 1
+
+    def ordered(self):
+        """Rows oldest -> newest."""
+        if self.count <= self.capacity:
+            return self.rows[:self.count]
+        i = self.count % self.capacity
+        return np.concatenate((self.rows[i:], self.rows[:i]))
+
+    def column(self, name):
+        values = self.ordered()[:, self._col[name]]
+        return values[~np.isnan(values)]
+
+    def summary(self, name):
+        """(p50, p95, max) of a field, or None if it has no samples."""
+        values = self.column(name)
+        if not len(values):
+            return None
+        p50, p95 = np.percentile(values, [50, 95])
+        return p50, p95, values.max()
+
+    def to_csv(self):
+        out = io.StringIO()
+        out.write(",".join(TICK_FIELDS) + "\n")
+        np.savetxt(out, self.ordered(), delimiter=",", fmt="%.3f")
+        return out.getvalue().replace("nan", "")
+
+
+def tick_timings():
+    ss = st.session_state
+    if "tick_timings" not in ss:
+        ss["tick_timings"] = TickTimings()
+    return ss["tick_timings"]
+
+
+def _phase(name, ms):
+    """Note one phase duration for the tick this script run executes."""
+    st.session_state.setdefault("tick_phases", {})[name] = ms
+
+
+def _begin_script_timing(ss):
+    """Start of a script run: open a fresh phase row; charge the rerun gap to it."""
+    ss["script_started"] = time.perf_counter()
+    ss["tick_phases"] = {}
+    rerun_at = ss.get("rerun_at")
+    if rerun_at is not None:
+        ss["tick_phases"]["rerun_ms"] = (ss["script_started"] - rerun_at) * 1000
+        ss["rerun_at"] = None
+
+
+def _commit_tick(ss, late_ms):
+    phases = ss.get("tick_phases", {})
+    script_ms = (time.perf_counter() - ss.get("script_started", time.perf_counter())) * 1000
+    tick_timings().append(tick=ss["steps"], tick_ms=ss["tick_ms"], late_ms=late_ms,
+                          script_ms=script_ms, **phases)
+
+
+def _tick_debug_panel():
+    """Histograms and percentiles of the recorded phases, plus CSV export."""
+    timings = tick_timings()
+    if not len(timings):
+        st.markdown("<div class='meta-label'>Start a server-loop game to record ticks.</div>",
+                    unsafe_allow_html=True)
+        return
+    st.markdown(f"<div class='meta-label'>{len(timings)} ticks (last {timings.capacity} kept)</div>",
+                unsafe_allow_html=True)
+    lines = []
+    for name in TICK_PHASES:
+        stats = timings.summary(name)
+        if stats:
+            lines.append(f"{name[:-3]}: p50 {stats[0]:.1f} · p95 {stats[1]:.1f} · max {stats[2]:.1f} ms")
+    st.markdown("<div class='meta-label'>" + "<br>".join(lines) + "</div>", unsafe_allow_html=True)
+    phase = st.selectbox("Histogram", TICK_PHASES, key="tick_hist_phase")
+    values = timings.column(phase)
+    if len(values):
+        counts, edges = np.histogram(values, bins=TICK_HIST_BINS)
+        st.bar_chart({"ms": np.round(edges[:-1], 2), "ticks": counts}, x="ms", y="ticks", height=160)
+    total = timings.summary("script_ms")
+    late = timings.summary("late_ms")
+    if total and late:
+        st.markdown(f"<div class='meta-label'>A tick_ms preset below ~{total[1] + max(0.0, late[1]):.0f} ms"
+                    " (p95 script + p95 lateness) will run late under this load.</div>",
+                    unsafe_allow_html=True)
+    st.download_button("Export CSV", timings.to_csv(), file_name="snake_tick_timings.csv",
+                       mime="text/csv", key="tick_csv")
+
+
+def _autopilot_turn(ss):
+    """Let the session's Autopilot pick the next direction (kept across ticks for its search state)."""
+    pilot = ss.get("autopilot_obj")
+    if pilot is None or pilot.grid_size != tuple(ss["grid_size"]):
+        pilot = ss["autopilot_obj"] = Autopilot(ss["grid_size"])
+    if isinstance(ss["snake"], SnakeBody):
+        turn(ss, pilot.decide(ss))
+        if pilot.stuck:
+            # bounded: hand the game back instead of circling forever
+            ss["autopilot"] = False
+            ss["autopilot_obj"] = None
+            st.toast("Autopilot made no progress; control is back with you.")
+
+
 def run_game_loop():
     """
     Non-blocking loop using Streamlit's rerun mechanism.
@@ -472,93 +1063,122 @@ def run_game_loop():
 
     # This is the single-threaded game loop logic
     if ss["running"] and not ss["game_over"]:
+        due = ss["last_update_ts"] + ss["tick_ms"]
+        # wait out the rest of the tick here; returning without a rerun would stall the loop
+        time.sleep(max(0, due - now_ms()) / 1000)
         now = now_ms()
-        elapsed = now - ss["last_update_ts"]
-
-        if elapsed >= ss["tick_ms"]:
-            ss["last_update_ts"] = now
-            # handle pending direction change
-            ss["direction"] = ss["next_direction"]
-            result = step()
-
-            # sound on eat / collision
-            if result["ate"] and ss["sound_on"]:
-                st.markdown(play_sound_html(ss["eat_sound_b64"]), unsafe_allow_html=True)
-            if result["collision"] and ss["game_over"] and ss["sound_on"]:
-                st.markdown(play_sound_html(ss["death_sound_b64"]), unsafe_allow_html=True)
-            
-            # Trigger a rerun to draw the next frame
-            if not ss["game_over"]:
-                st.rerun()
+        late_ms = now - due
+        ss["last_update_ts"] = now
+
+        t0 = time.perf_counter()
+        if ss["autopilot"]:
+            _autopilot_turn(ss)
+        t1 = time.perf_counter()
+        result = step()  # applies the pending direction change
+        t2 = time.perf_counter()
+        _phase("autopilot_ms", (t1 - t0) * 1000)
+        _phase("step_ms", (t2 - t1) * 1000)
+
+        # sound on eat / collision
+        if result["ate"] and ss["sound_on"]:
+            st.markdown(play_sound_html(ss["eat_sound_b64"]), unsafe_allow_html=True)
+        if result["collision"] and ss["game_over"] and ss["sound_on"]:
+            st.markdown(play_sound_html(ss["death_sound_b64"]), unsafe_allow_html=True)
+        
+        _commit_tick(ss, late_ms)
+        # Trigger a rerun to draw the next frame
+        if not ss["game_over"]:
+            ss["rerun_at"] = time.perf_counter()
+            st.rerun()
 
-def main():
-    st.set_page_config(page_title="Streamlit Snake", layout="wide", initial_sidebar_state="collapsed")
+# -----------------------
+# Client-side Game Loop
+# -----------------------
+# The browser component simulates and draws the game at its own frame rate and
+# only reports events back, so a running game costs no reruns at all.
+_snake_client = components.declare_component(
+    "snake_client", path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "snake_component"))
 
-    init_state()
-    _inject_global_css()
 
+def handle_client_event(event):
+    """
+    Apply one event from the browser component to session state.
+    The component value persists across reruns, so events are deduped by seq.
+    """
     ss = st.session_state
+    if not event or event.get("seq") in ss["client_seen"]:
+        return False
+    ss["client_seen"].add(event["seq"])
+    kind = event.get("type")
+    score = int(event.get("score", 0))
+
+    if kind == "start":
+        ss["score"], ss["level"], ss["streak"] = 0, 1, 0
+        # running stays False: the browser owns play/pause, and a stale True would lock the sidebar
+        ss["game_over"], ss["won"] = False, False
+        ss["run_recorded"] = False
+        ss["achievement_badges"] = set()
+    elif kind in ("score", "high_score"):
+        ss["score"] = score
+        ss["level"] = 1 + score // LEVEL_UP_FOOD
+        for t in BADGE_THRESHOLDS:
+            if score >= t:
+                ss["achievement_badges"].add(t)
+    elif kind == "game_over":
+        ss["score"] = score
+        ss["game_over"] = True
+        ss["won"] = bool(event.get("won"))
 
-    # Sidebar: settings
-    with st.sidebar:
-        st.markdown("<h2 style='margin-top:0'>Snake Settings</h2>", unsafe_allow_html=True)
-        grid_preset = st.selectbox("Grid size", ("Small 12×12", "Default 20×20", "Large 28×28"),
-                                   index=1, disabled=ss["running"])
-        if grid_preset == "Small 12×12":
-            ss["grid_size"] = (12, 12)
-        elif grid_preset == "Large 28×28":
-            ss["grid_size"] = (28, 28)
-        else:
-            ss["grid_size"] = DEFAULT_GRID
-
-        preset_speed = st.select_slider("Speed", options=list(SPEED_PRESETS.keys()),
-                                        value="Normal")
-        ss["tick_ms"] = SPEED_PRESETS.get(preset_speed, BASE_TICK_MS)
-
-        sound = st.checkbox("Sound effects", value=ss["sound_on"])
-        ss["sound_on"] = sound
+    if score > ss.get("high_score", 0):
+        ss["high_score"] = score
+    if kind == "game_over":
+        record_run(ss)
+    return True
 
-        st.markdown("---")
-        st.markdown("**High score**")
-        st.markdown(f"<div class='badge'>{ss.get('high_score', 0)}</div>", unsafe_allow_html=True)
-        st.markdown("---")
-        st.markdown("**Tips**")
-        st.markdown("<div class='meta-label'>Click game area once to focus. Use W/A/S/D. Space = Start/Pause.</div>", unsafe_allow_html=True)
 
-    # Top header and scoreboard
-    col1, col2 = st.columns([2, 1])
-    with col1:
-        st.markdown("<h1 style='color:var(--fg); margin-bottom:0.1rem;'>Snake</h1>", unsafe_allow_html=True)
-        st.markdown("<div class='meta-label'>Classic snake — WASD + D-pad, responsive, accessible</div>", unsafe_allow_html=True)
-    with col2:
-        st.markdown("<div style='text-align:right'>", unsafe_allow_html=True)
-        st.markdown(f"<div style='font-size:1.2rem; font-weight:700'>Score: {ss['score']}</div>", unsafe_allow_html=True)
-        st.markdown(f"<div class='meta-label'>Level: {ss['level']}</div>", unsafe_allow_html=True)
-        st.markdown(f"<div class='meta-label'>Streak: {ss['streak']}</div>", unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+def _client_game(board_col, control_col):
+    """Board, input and loop all live in the browser component."""
+    ss = st.session_state
+    with board_col:
+        event = _snake_client(
+            grid=list(ss["grid_size"]),
+            cell_size=canvas_cell_size(ss["grid_size"], ss["cell_size"]),
+            tick_ms=ss["tick_ms"],
+            min_tick_ms=MIN_TICK_MS,
+            level_up_food=LEVEL_UP_FOOD,
+            high_score=ss.get("high_score", 0),
+            key="snake_client",
+            default=None,
+        )
+    if handle_client_event(event):
+        if event.get("type") == "game_over" and ss["sound_on"]:
+            st.markdown(play_sound_html(ss["death_sound_b64"]), unsafe_allow_html=True)
+    with control_col:
+        st.markdown("<h2 style='margin-bottom:0.2rem'>Controls</h2>", unsafe_allow_html=True)
+        st.markdown("<div class='meta-label'>Click the board, then W/A/S/D or arrows. "
+                    "Space = Start/Pause. The on-board D-pad works on touch screens.</div>",
+                    unsafe_allow_html=True)
+        st.markdown(f"<div class='meta-label'>Tick: {ss['tick_ms']} ms</div>", unsafe_allow_html=True)
+        st.markdown("<div style='margin-top:6px'>Badges:</div>", unsafe_allow_html=True)
+        badges_html = " ".join([f"<span class='badge'>{b}</span>" for b in sorted(ss["achievement_badges"])])
+        st.markdown(badges_html or "<div class='meta-label'>No badges yet</div>", unsafe_allow_html=True)
 
-    # Layout: main board and controls
-    board_col, control_col = st.columns([3, 1], gap="large")
 
-    rows, cols = ss["grid_size"]
-    if rows * cols >= (28 * 28):
-        ss["cell_size"] = DEFAULT_CELL_MOBILE
-    else:
-        ss["cell_size"] = DEFAULT_CELL_DESKTOP
+def _server_game(board_col, control_col):
+    """Fallback: Python renders every frame and reruns the script each tick."""
+    ss = st.session_state
 
     # Board placeholder
     with board_col:
         board_box = st.empty()
-        if ss["snake"] is None or ss["food_pos"] is None:
+        if ss["snake"] is None or (ss["food_pos"] is None and not ss["won"]):
             reset_game()
-        img = draw_board(ss["grid_size"], ss["snake"], ss["food_pos"], cell_size=ss["cell_size"], pulse_frame=ss["pulse_frame"])
-        board_box.image(img, use_container_width=False)
-        
-        if ss["game_over"]:
-            st.markdown("<div class='snake-toast'>Game Over — Press Play to try again</div>", unsafe_allow_html=True)
+        show_frame(board_box, ss)
 
-    # Controls placeholder (used for audio HTML injection too)
-    control_placeholder = control_col.empty()
+        if ss["won"]:
+            st.markdown("<div class='snake-toast'>Board full — you win! Press Play to go again</div>", unsafe_allow_html=True)
+        elif ss["game_over"]:
+            st.markdown("<div class='snake-toast'>Game Over — Press Play to try again</div>", unsafe_allow_html=True)
 
     # Controls UI (Start/Pause, Restart, D-pad)
     with control_col:
@@ -567,6 +1187,7 @@ def main():
         start_paused = st.button(start_label, key="start_pause", help="Space toggles play/pause")
         if start_paused:
             ss["running"] = not ss["running"]
+            ss["last_update_ts"] = now_ms()  # the tick schedule restarts on play
             ss["auto_focus_key"] += 1
 
         restart_pressed = st.button("Restart", key="restart")
@@ -576,6 +1197,8 @@ def main():
             st.rerun()
 
         st.markdown(f"<div class='meta-label'>Tick: {ss['tick_ms']} ms</div>", unsafe_allow_html=True)
+        st.markdown(f"<div class='meta-label'>{_frame_stats_caption(ss['frame_mode'])}</div>",
+                    unsafe_allow_html=True)
         st.markdown("<div style='margin-top:6px'>Badges:</div>", unsafe_allow_html=True)
         badges_html = " ".join([f"<span class='badge'>{b}</span>" for b in sorted(ss["achievement_badges"])])
         st.markdown(badges_html or "<div class='meta-label'>No badges yet</div>", unsafe_allow_html=True)
@@ -606,29 +1229,151 @@ def main():
     if ss["running"] and not ss["game_over"]:
         run_game_loop()
 
+
+# -----------------------
+# Replay Viewer
+# -----------------------
+@st.fragment
+def _replay_viewer():
+    """Pick a recorded run (last, stored or uploaded) and scrub through it tick by tick."""
+    ss = st.session_state
+    leaderboard = get_leaderboard()
+    sources = {}
+    if ss.get("last_replay"):
+        sources["Last run"] = lambda: ss["last_replay"]
+    for rowid, grid, speed, score, ticks, created in leaderboard.recent_replays():
+        label = f"{time.strftime('%m-%d %H:%M', time.localtime(created))} · {grid} {speed} · score {score}"
+        sources[label] = lambda rowid=rowid: leaderboard.load_replay(rowid)
+    sources["Upload a replay file"] = None
+
+    choice = st.selectbox("Replay", list(sources), key="replay_source")
+    if sources[choice] is None:
+        upload = st.file_uploader("Replay file", type=["snkr"], key="replay_upload")
+        data = upload.getvalue() if upload else None
+    else:
+        data = sources[choice]()
+    if not data:
+        st.markdown("<div class='meta-label'>Finish a run in server mode to record a replay.</div>",
+                    unsafe_allow_html=True)
+        return
+    try:
+        replay = Replay.from_bytes(data)
+    except ValueError as e:
+        st.error(f"Could not read replay: {e}")
+        return
+
+    # the player keeps its snapshots across scrubs of the same replay
+    cached = ss.get("replay_player")
+    if cached is None or cached[0] != data:
+        cached = ss["replay_player"] = (data, ReplayPlayer(replay))
+    tick = st.slider("Tick", 0, replay.ticks, replay.ticks, key="replay_tick")
+    state = cached[1].state_at(tick)
+    cell, view = board_layout(replay.grid_size)
+    if view:
+        img = ViewportRenderer(replay.grid_size, cell, view).render(state["snake"], state["food_pos"])
+    else:
+        img = draw_board(replay.grid_size, state["snake"], state["food_pos"], cell_size=cell)
+    st.image(img, use_container_width=False)
+    st.markdown(f"<div class='meta-label'>Tick {tick}/{replay.ticks} · score {state['score']}"
+                f" (final {replay.score}) · {len(replay.turns)} turns · {len(data)} bytes</div>",
+                unsafe_allow_html=True)
+    st.download_button("Download replay", data, file_name=f"snake_{replay.seed:x}.snkr",
+                       mime="application/octet-stream", key="replay_download")
+
+
+def main():
+    st.set_page_config(page_title="Streamlit Snake", layout="wide", initial_sidebar_state="collapsed")
+
+    init_state()
+    _inject_global_css()
+
+    ss = st.session_state
+    _begin_script_timing(ss)
+
+    # Sidebar: settings
+    with st.sidebar:
+        st.markdown("<h2 style='margin-top:0'>Snake Settings</h2>", unsafe_allow_html=True)
+        grid_preset = st.selectbox("Grid size", list(GRID_PRESETS), index=1, disabled=ss["running"])
+        ss["grid_size"] = GRID_PRESETS[grid_preset]
+
+        preset_speed = st.select_slider("Speed", options=list(SPEED_PRESETS.keys()),
+                                        value="Normal")
+        ss["tick_ms"] = SPEED_PRESETS.get(preset_speed, BASE_TICK_MS)
+        ss["speed_preset"] = preset_speed
+
+        ss["loop_mode"] = st.radio("Game loop", LOOP_MODES, index=LOOP_MODES.index(ss["loop_mode"]),
+                                   disabled=ss["running"],
+                                   help="Browser runs the game in the page; Server reruns the script every tick.")
+
+        if ss["loop_mode"] != LOOP_MODES[0]:
+            ss["autopilot"] = st.checkbox("Autopilot", value=ss["autopilot"],
+                                          help="BFS to the food, only when the tail stays reachable.")
+            ss["frame_mode"] = st.selectbox("Frame transport", FRAME_MODES,
+                                            index=FRAME_MODES.index(ss["frame_mode"]),
+                                            help="How server-rendered frames are sent to the browser.")
+            with st.expander("Tick timing"):
+                _tick_debug_panel()
+
+        sound = st.checkbox("Sound effects", value=ss["sound_on"])
+        ss["sound_on"] = sound
+
+        st.markdown("---")
+        st.markdown("**High score**")
+        board = board_key(ss["grid_size"], ss["speed_preset"])
+        leaderboard = get_leaderboard()
+        ss["high_score"] = max(leaderboard.best(board), ss["score"])
+        st.markdown(f"<div class='badge'>{ss.get('high_score', 0)}</div>", unsafe_allow_html=True)
+        top = leaderboard.top(board, 5)
+        if top:
+            st.markdown("<div class='meta-label'>" + f"Top {board[0]} · {board[1]}: "
+                        + " · ".join(str(v) for v in top) + "</div>", unsafe_allow_html=True)
+        st.markdown("---")
+        st.markdown("**Tips**")
+        st.markdown("<div class='meta-label'>Click game area once to focus. Use W/A/S/D. Space = Start/Pause.</div>", unsafe_allow_html=True)
+
+    # Top header and scoreboard
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        st.markdown("<h1 style='color:var(--fg); margin-bottom:0.1rem;'>Snake</h1>", unsafe_allow_html=True)
+        st.markdown("<div class='meta-label'>Classic snake — WASD + D-pad, responsive, accessible</div>", unsafe_allow_html=True)
+    with col2:
+        st.markdown("<div style='text-align:right'>", unsafe_allow_html=True)
+        st.markdown(f"<div style='font-size:1.2rem; font-weight:700'>Score: {ss['score']}</div>", unsafe_allow_html=True)
+        st.markdown(f"<div class='meta-label'>Level: {ss['level']}</div>", unsafe_allow_html=True)
+        st.markdown(f"<div class='meta-label'>Streak: {ss['streak']}</div>", unsafe_allow_html=True)
+        st.markdown("</div>", unsafe_allow_html=True)
+
+    # Layout: main board and controls
+    board_col, control_col = st.columns([3, 1], gap="large")
+
+    ss["cell_size"], ss["viewport"] = board_layout(ss["grid_size"])
+
+    if ss["loop_mode"] == LOOP_MODES[0]:
+        _client_game(board_col, control_col)
+    else:
+        _server_game(board_col, control_col)
+
     if ss["game_over"]:
         st.markdown("---")
-        st.markdown("<h2>Game Over</h2>", unsafe_allow_html=True)
+        st.markdown("<h2>You Win!</h2>" if ss["won"] else "<h2>Game Over</h2>", unsafe_allow_html=True)
         st.markdown(f"<div>Score: <strong>{ss['score']}</strong></div>", unsafe_allow_html=True)
         st.markdown(f"<div>High score: <strong>{ss['high_score']}</strong></div>", unsafe_allow_html=True)
-        if st.button("Play Again"):
+        if ss["loop_mode"] != LOOP_MODES[0] and st.button("Play Again"):
             reset_game(preserve_high_score=True)
             ss["auto_focus_key"] += 1
             st.rerun()
 
+    if not ss["running"]:
+        with st.expander("Replays"):
+            _replay_viewer()
+
     st.markdown("---")
     st.markdown("<div style='display:flex; gap:10px; align-items:center;'>"
                 f"<div class='meta-label'>Next level in: {max(0, LEVEL_UP_FOOD - (ss['score'] % LEVEL_UP_FOOD))} foods</div>"
                 f"<div style='flex:1'></div>"
                 f"<div class='meta-label'>Highscore: {ss['high_score']}</div>"
                 "</div>", unsafe_allow_html=True)
-    
-    # Final persistence of high score
-    if ss.get("high_score") is not None:
-        try:
-            save_high_score(ss["high_score"])
-        except Exception:
-            pass
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
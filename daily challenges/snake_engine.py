@@ -0,0 +1,766 @@
+# snake_engine.py
+# Streamlit-free Snake rules, shared by day15.py and the headless tools.
+# A game is a plain dict (session_state works too), so the same step function
+# drives the app, bots and benchmarks. BatchSimulator runs thousands of
+# independent games per NumPy call.
+import random
+from array import array
+from collections import deque
+
+import numpy as np
+
+LEVEL_UP_FOOD = 5
+BADGE_THRESHOLDS = [5, 10, 20]
+BASE_TICK_MS = 160  # normal speed
+MIN_TICK_MS = 60
+DIRECTIONS = ((-1, 0), (0, -1), (1, 0), (0, 1))  # up, left, down, right
+_DR = np.array([d[0] for d in DIRECTIONS], dtype=np.int64)
+_DC = np.array([d[1] for d in DIRECTIONS], dtype=np.int64)
+
+
+# -----------------------
+# Snake Body
+# -----------------------
+class SnakeBody:
+    """
+    Snake segments ordered tail -> head, kept as a deque plus an occupancy set,
+    so moving, growing and self-collision checks are all O(1).
+    Behaves like the old list for reading (len, iteration, snake[-1]) and
+    pickles as a plain list of (r, c) tuples for session state.
+    """
+
+    __slots__ = ("_cells", "_occupied")
+
+    def __init__(self, cells=()):
+        self._cells = deque(tuple(c) for c in cells)
+        self._occupied = set(self._cells)
+
+    def __len__(self):
+        return len(self._cells)
+
+    def __iter__(self):
+        return iter(self._cells)
+
+    def __contains__(self, cell):
+        return cell in self._occupied
+
+    def __getitem__(self, i):
+        # O(1) at either end, which is all the game uses
+        return self._cells[i]
+
+    def __eq__(self, other):
+        return list(self._cells) == list(other)
+
+    def __repr__(self):
+        return f"SnakeBody({list(self._cells)!r})"
+
+    @property
+    def head(self):
+        return self._cells[-1]
+
+    @property
+    def tail(self):
+        return self._cells[0]
+
+    def grow(self, cell):
+        """Push a new head without dropping the tail."""
+        self._cells.append(cell)
+        self._occupied.add(cell)
+
+    def move(self, cell):
+        """Drop the tail and push a new head. Returns the vacated tail cell."""
+        old_tail = self._cells.popleft()
+        self._occupied.discard(old_tail)
+        self._cells.append(cell)
+        self._occupied.add(cell)
+        return old_tail
+
+    def to_list(self):
+        return list(self._cells)
+
+    def __getstate__(self):
+        return self.to_list()
+
+    def __setstate__(self, cells):
+        self._cells = deque(tuple(c) for c in cells)
+        self._occupied = set(self._cells)
+
+
+class FreeCellIndex:
+    """
+    The cells not covered by the snake, as a swap-remove array of flat cell
+    ids plus a cell -> slot map. Occupying, releasing and picking a random
+    free cell are O(1); an empty index means the board is full.
+    """
+
+    def __init__(self, grid_size, occupied=()):
+        rows, cols = grid_size
+        self.grid_size = (rows, cols)
+        taken = {r * cols + c for r, c in occupied}
+        self._cells = [i for i in range(rows * cols) if i not in taken]
+        self._slot = [-1] * (rows * cols)  # -1 = occupied
+        for k, i in enumerate(self._cells):
+            self._slot[i] = k
+
+    def __len__(self):
+        return len(self._cells)
+
+    def __contains__(self, cell):
+        return self._slot[cell[0] * self.grid_size[1] + cell[1]] >= 0
+
+    def occupy(self, cell):
+        i = cell[0] * self.grid_size[1] + cell[1]
+        k = self._slot[i]
+        if k < 0:
+            return
+        last = self._cells.pop()
+        if last != i:
+            self._cells[k] = last
+            self._slot[last] = k
+        self._slot[i] = -1
+
+    def release(self, cell):
+        i = cell[0] * self.grid_size[1] + cell[1]
+        if self._slot[i] >= 0:
+            return
+        self._slot[i] = len(self._cells)
+        self._cells.append(i)
+
+    def choice(self, rng=random):
+        """Random free cell as (r, c), or None when the board is full."""
+        if not self._cells:
+            return None
+        return divmod(self._cells[rng.randrange(len(self._cells))], self.grid_size[1])
+
+    def compact(self):
+        """The swap-remove order as a compact int array (the order decides future food picks)."""
+        return array("i", self._cells)
+
+    @classmethod
+    def from_compact(cls, grid_size, cells):
+        """Rebuild an index from compact(); the exact inverse, so food placement stays deterministic."""
+        free = cls.__new__(cls)
+        rows, cols = grid_size
+        free.grid_size = (rows, cols)
+        free._cells = list(cells)
+        free._slot = [-1] * (rows * cols)
+        for k, i in enumerate(free._cells):
+            free._slot[i] = k
+        return free
+
+
+# -----------------------
+# Game Rules
+# -----------------------
+def place_food(free_cells, rng=random):
+    """Place food at a random free cell in O(1). Returns None if the board is full."""
+    return free_cells.choice(rng)
+
+
+def new_game(grid_size, rng=random, tick_ms=BASE_TICK_MS):
+    """Fresh run state for a grid: a 3-cell snake in the middle heading right."""
+    rows, cols = grid_size
+    mid_r, mid_c = rows // 2, cols // 2
+    initial_snake = [(mid_r, mid_c - i) for i in range(3)][::-1]  # head at end
+    free = FreeCellIndex(grid_size, initial_snake)
+    return {
+        "grid_size": tuple(grid_size),
+        "snake": SnakeBody(initial_snake),  # (r, c) cells, tail first
+        "free_cells": free,
+        "direction": (0, 1),
+        "next_direction": (0, 1),
+        "food_pos": place_food(free, rng),
+        "score": 0,
+        "level": 1,
+        "game_over": False,
+        "won": False,
+        "tick_ms": tick_ms,
+        "steps": 0,
+        "streak": 0,
+        "achievement_badges": set(),
+    }
+
+
+def turn(state, direction):
+    """Queue a direction change for the next tick; 180-degree reversals are ignored."""
+    cur = state["direction"]
+    if len(state["snake"]) > 1 and direction[0] == -cur[0] and direction[1] == -cur[1]:
+        return False
+    state["next_direction"] = direction
+    return True
+
+
+def free_cells(state):
+    """The state's free-cell index, rebuilt only if missing or for another grid."""
+    free = state.get("free_cells")
+    if free is None or free.grid_size != tuple(state["grid_size"]):
+        free = state["free_cells"] = FreeCellIndex(state["grid_size"], state["snake"])
+    return free
+
+
+def advance(state, rng=random):
+    """
+    Advance one game one tick, applying the queued direction first.
+    Returns dict with 'ate', 'collision' and 'level_up' flags.
+    """
+    if state["game_over"]:
+        return {"ate": False, "collision": True, "level_up": False}
+
+    snake = state["snake"]
+    if not isinstance(snake, SnakeBody):  # state saved by an older version
+        snake = state["snake"] = SnakeBody(snake)
+    free = free_cells(state)
+    dirr = state["direction"] = state["next_direction"]
+    head = snake.head
+    new_head = (head[0] + dirr[0], head[1] + dirr[1])
+    rows, cols = state["grid_size"]
+
+    # wall collision, then self collision (O(1) occupancy lookup)
+    if not (0 <= new_head[0] < rows and 0 <= new_head[1] < cols) or new_head in snake:
+        state["game_over"] = True
+        state["running"] = False
+        return {"ate": False, "collision": True, "level_up": False}
+
+    ate = level_up = False
+    if new_head == state["food_pos"]:
+        ate = True
+        snake.grow(new_head)
+        free.occupy(new_head)
+        state["score"] += 1
+        state["steps"] += 1
+        state["streak"] += 1
+        # place new food; no free cell left means the snake filled the board
+        state["food_pos"] = place_food(free, rng)
+        if state["food_pos"] is None:
+            state["won"] = True
+            state["game_over"] = True
+            state["running"] = False
+        # level up every LEVEL_UP_FOOD
+        new_level = 1 + (state["score"] // LEVEL_UP_FOOD)
+        if new_level != state["level"]:
+            level_up = True
+            state["level"] = new_level
+            # speed up slightly but clamp minimum tick
+            state["tick_ms"] = max(MIN_TICK_MS, int(state["tick_ms"] * 0.92))
+        for t in BADGE_THRESHOLDS:
+            if state["score"] >= t:
+                state["achievement_badges"].add(t)
+    else:
+        # move normally: drop tail, push new head
+        old_tail = snake.move(new_head)
+        free.occupy(new_head)
+        free.release(old_tail)
+        state["steps"] += 1
+        state["streak"] = 0  # reset streak on non-food move
+
+    return {"ate": ate, "collision": False, "level_up": level_up}
+
+
+# -----------------------
+# Batched Simulation
+# -----------------------
+class BatchSimulator:
+    """
+    n independent games on one grid size, advanced together with NumPy.
+
+    A snake moves exactly one cell per tick, so its body is always the last
+    `length` cells its head entered. Each game therefore keeps only its own
+    tick counter `clock` and `entered[cell]` (the tick the head last entered
+    that cell): a cell is occupied iff clock - entered < length. Moving never
+    touches the tail and eating is just length += 1.
+    Same rules as advance(): hitting the current tail is a collision, and
+    filling the board wins. Dead games stay frozen until reset().
+    """
+
+    NEVER = -(2 ** 30)
+
+    def __init__(self, n, grid_size=(20, 20), seed=None):
+        self.n = n
+        self.rows, self.cols = grid_size
+        self.rng = np.random.default_rng(seed)
+        self.reset()
+
+    def reset(self, games=None):
+        """Start fresh runs for the listed game indices (all games by default)."""
+        n, rows, cols = self.n, self.rows, self.cols
+        if games is None:
+            self.clock = np.zeros(n, dtype=np.int32)
+            self.entered = np.full((n, rows * cols), self.NEVER, dtype=np.int32)
+            self.head = np.zeros(n, dtype=np.int64)
+            self.direction = np.zeros(n, dtype=np.int8)
+            self.length = np.zeros(n, dtype=np.int32)
+            self.score = np.zeros(n, dtype=np.int32)
+            self.steps = np.zeros(n, dtype=np.int64)
+            self.alive = np.zeros(n, dtype=bool)
+            self.won = np.zeros(n, dtype=bool)
+            self.food = np.full(n, -1, dtype=np.int64)
+            games = np.arange(n)
+        games = np.asarray(games, dtype=np.int64)
+        if not len(games):
+            return
+        mid_r, mid_c = rows // 2, cols // 2
+        self.clock[games] = 2
+        self.entered[games] = self.NEVER
+        for age, c in enumerate((mid_c - 2, mid_c - 1, mid_c)):  # head entered at tick 2
+            self.entered[games, mid_r * cols + c] = age
+        self.head[games] = mid_r * cols + mid_c
+        self.direction[games] = 3  # right
+        self.length[games] = 3
+        self.score[games] = 0
+        self.steps[games] = 0
+        self.alive[games] = True
+        self.won[games] = False
+        self._place_food(games)
+
+    @property
+    def level(self):
+        return 1 + self.score // LEVEL_UP_FOOD
+
+    def occupied(self):
+        """(n, rows * cols) bool mask of snake cells."""
+        return (self.clock[:, None] - self.entered) < self.length[:, None]
+
+    def _place_food(self, games):
+        """Uniform random free cell for each listed game; games with no free cell win."""
+        if not len(games):
+            return
+        free = (self.clock[games, None] - self.entered[games]) >= self.length[games, None]
+        counts = free.sum(axis=1)
+        full = counts == 0
+        if full.any():
+            done = games[full]
+            self.won[done] = True
+            self.alive[done] = False
+            self.food[done] = -1
+            games, free, counts = games[~full], free[~full], counts[~full]
+        pick = (self.rng.random(len(games)) * counts).astype(np.int64)  # k-th free cell
+        self.food[games] = (np.cumsum(free, axis=1) > pick[:, None]).argmax(axis=1)
+
+    def random_actions(self):
+        """A random direction per game; reversals are dropped by step()."""
+        return self.rng.integers(0, 4, self.n, dtype=np.int8)
+
+    def step(self, actions=None):
+        """
+        Advance every live game one tick. actions: per-game index into
+        DIRECTIONS, or None to keep going straight.
+        Returns (ate, died) bool masks for this tick.
+        """
+        if actions is not None:
+            actions = np.asarray(actions, dtype=np.int8)
+            # DIRECTIONS is ordered so that d and (d + 2) % 4 are opposites
+            ok = (actions != (self.direction + 2) % 4) | (self.length <= 1)
+            self.direction = np.where(ok, actions, self.direction).astype(np.int8)
+
+        live = np.flatnonzero(self.alive)
+        d = self.direction[live]
+        r, c = np.divmod(self.head[live], self.cols)
+        nr, nc = r + _DR[d], c + _DC[d]
+        inside = (nr >= 0) & (nr < self.rows) & (nc >= 0) & (nc < self.cols)
+        cell = np.where(inside, nr * self.cols + nc, 0)
+        hit_self = (self.clock[live] - self.entered[live, cell]) < self.length[live]
+        dies = ~inside | hit_self
+
+        ate = np.zeros(self.n, dtype=bool)
+        died = np.zeros(self.n, dtype=bool)
+        died[live[dies]] = True
+        self.alive[live[dies]] = False
+
+        moving, cell = live[~dies], cell[~dies]
+        self.clock[moving] += 1
+        self.entered[moving, cell] = self.clock[moving]
+        self.head[moving] = cell
+        self.steps[moving] += 1
+        eating = moving[cell == self.food[moving]]
+        ate[eating] = True
+        self.length[eating] += 1
+        self.score[eating] += 1
+        self._place_food(eating)
+        return ate, died
+
+    def snake(self, game):
+        """Cells of one game's snake as (r, c), tail first, for checks and drawing."""
+        cells = np.flatnonzero((self.clock[game] - self.entered[game]) < self.length[game])
+        order = np.argsort(self.entered[game, cells])
+        return [divmod(int(i), self.cols) for i in cells[order]]
+
+
+# -----------------------
+# Replays
+# -----------------------
+# A run is fully determined by its grid, its food seed and the direction in
+# effect at every tick, so a replay stores only the direction changes.
+# Layout: MAGIC, then varints: version, rows, cols, seed, ticks, score,
+# number of turns, and per turn (ticks since the previous turn << 2 | direction).
+REPLAY_MAGIC = b"SNKR"
+REPLAY_VERSION = 1
+# Headers are checked before anything is allocated, so an uploaded file cannot
+# ask for a board or a run the viewer cannot afford to replay.
+REPLAY_MIN_SIDE = 4
+REPLAY_MAX_SIDE = 200  # the largest grid preset
+REPLAY_MAX_TICKS = 1_000_000
+REPLAY_SNAPSHOTS = 64  # most snapshots a ReplayPlayer keeps
+REPLAY_SNAPSHOT_EVERY = 256  # snapshot spacing for short replays
+
+
+def _put_varint(out, n):
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return
+
+
+def _get_varint(data, pos):
+    n = shift = 0
+    while True:
+        if pos >= len(data):
+            raise ValueError("truncated replay")
+        byte = data[pos]
+        pos += 1
+        n |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return n, pos
+        shift += 7
+
+
+class Replay:
+    """A recorded run: grid, seed, tick count, final score and (tick, direction index) turns."""
+
+    __slots__ = ("grid_size", "seed", "ticks", "score", "turns")
+
+    def __init__(self, grid_size, seed, ticks=0, score=0, turns=()):
+        self.grid_size = tuple(grid_size)
+        self.seed = seed
+        self.ticks = ticks
+        self.score = score
+        self.turns = list(turns)
+
+    def to_bytes(self):
+        out = bytearray(REPLAY_MAGIC)
+        for n in (REPLAY_VERSION, *self.grid_size, self.seed, self.ticks, self.score, len(self.turns)):
+            _put_varint(out, n)
+        prev = 0
+        for tick, d in self.turns:
+            _put_varint(out, (tick - prev) << 2 | d)
+            prev = tick
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data):
+        if data[:len(REPLAY_MAGIC)] != REPLAY_MAGIC:
+            raise ValueError("not a snake replay")
+        pos = len(REPLAY_MAGIC)
+        fields = []
+        for _ in range(7):
+            n, pos = _get_varint(data, pos)
+            fields.append(n)
+        version, rows, cols, seed, ticks, score, n_turns = fields
+        if version != REPLAY_VERSION:
+            raise ValueError(f"unsupported replay version {version}")
+        if not (REPLAY_MIN_SIDE <= rows <= REPLAY_MAX_SIDE and REPLAY_MIN_SIDE <= cols <= REPLAY_MAX_SIDE):
+            raise ValueError(f"unsupported grid {rows}×{cols} (at most {REPLAY_MAX_SIDE}×{REPLAY_MAX_SIDE})")
+        if ticks > REPLAY_MAX_TICKS:
+            raise ValueError(f"replay too long: {ticks} ticks (at most {REPLAY_MAX_TICKS})")
+        if n_turns > ticks:
+            raise ValueError("corrupt replay: more turns than ticks")
+        turns, tick = [], 0
+        for _ in range(n_turns):
+            v, pos = _get_varint(data, pos)
+            tick += v >> 2
+            turns.append((tick, v & 3))
+        if turns and turns[-1][0] >= ticks:
+            raise ValueError("corrupt replay: turn after the last tick")
+        return cls((rows, cols), seed, ticks, score, turns)
+
+
+class ReplayRecorder:
+    """Call record() once per tick, just before advance(), with the direction about to apply."""
+
+    def __init__(self, grid_size, seed, direction=(0, 1)):
+        self.replay = Replay(grid_size, seed)
+        self._direction = direction
+
+    def record(self, direction):
+        if direction != self._direction:
+            self.replay.turns.append((self.replay.ticks, DIRECTIONS.index(tuple(direction))))
+            self._direction = direction
+        self.replay.ticks += 1
+
+    def finish(self, score):
+        self.replay.score = score
+        return self.replay
+
+
+def play_replay(replay, until=None):
+    """Re-run a replay headlessly; returns the game state after `until` ticks (default: all)."""
+    rng = random.Random(replay.seed)
+    state = new_game(replay.grid_size, rng)
+    end = replay.ticks if until is None else min(until, replay.ticks)
+    turns = iter(replay.turns)
+    pending = next(turns, None)
+    for tick in range(end):
+        while pending is not None and pending[0] == tick:
+            state["next_direction"] = DIRECTIONS[pending[1]]
+            pending = next(turns, None)
+        advance(state, rng)
+        if state["game_over"]:
+            break
+    return state
+
+
+class ReplayPlayer:
+    """
+    Random access into a replay, for scrubbing. Playback leaves a snapshot
+    (game, RNG state, turn cursor) every `every` ticks it passes, with at most
+    REPLAY_SNAPSHOTS of them, so state_at() replays at most `every` ticks
+    from the nearest snapshot instead of starting again from tick 0.
+    """
+
+    def __init__(self, replay):
+        self.replay = replay
+        self.every = max(REPLAY_SNAPSHOT_EVERY, -(-replay.ticks // REPLAY_SNAPSHOTS))
+        rng = random.Random(replay.seed)
+        self._snapshots = [self._freeze(new_game(replay.grid_size, rng), rng, 0)]  # at 0, every, 2*every, ...
+
+    @staticmethod
+    def _freeze(state, rng, cursor):
+        frozen = dict(state, snake=tuple(state["snake"]), free_cells=state["free_cells"].compact(),
+                      achievement_badges=set(state["achievement_badges"]))
+        return frozen, rng.getstate(), cursor
+
+    def _thaw(self, snapshot):
+        frozen, rng_state, cursor = snapshot
+        state = dict(frozen, snake=SnakeBody(frozen["snake"]),
+                     free_cells=FreeCellIndex.from_compact(self.replay.grid_size, frozen["free_cells"]),
+                     achievement_badges=set(frozen["achievement_badges"]))
+        rng = random.Random()
+        rng.setstate(rng_state)
+        return state, rng, cursor
+
+    def state_at(self, tick):
+        """Game state after `tick` ticks (clamped to the replay); same result as play_replay(replay, tick)."""
+        tick = max(0, min(tick, self.replay.ticks))
+        k = min(tick // self.every, len(self._snapshots) - 1)
+        state, rng, cursor = self._thaw(self._snapshots[k])
+        turns = self.replay.turns
+        t = k * self.every
+        while t < tick and not state["game_over"]:
+            while cursor < len(turns) and turns[cursor][0] == t:
+                state["next_direction"] = DIRECTIONS[turns[cursor][1]]
+                cursor += 1
+            advance(state, rng)
+            t += 1
+            if t % self.every == 0 and t // self.every == len(self._snapshots):
+                self._snapshots.append(self._freeze(state, rng, cursor))
+        return state
+
+
+# -----------------------
+# Autopilot
+# -----------------------
+class Autopilot:
+    """
+    BFS autopilot with a tail-reachability safety check.
+
+    Search structures live for the whole game: neighbor tables for the grid,
+    generation-stamped visited/parent arrays (never cleared between searches)
+    and `entered[cell]`, the tick the head last entered each cell, updated in
+    O(1) per tick. A body cell is vacated after length - (clock - entered)
+    moves, so paths may run over cells the tail will have left in time.
+
+    A path to the food is taken only if, after eating, the tail is still
+    reachable from the food; it is then followed without searching again
+    until the food is eaten or the game leaves the plan. Otherwise the snake
+    heads for its tail (retrying the food every RETRY_TICKS ticks), and
+    failing that moves into the largest open area.
+
+    Tail-following can circle forever when the food never becomes safe, so
+    after `patience` ticks without eating (two laps of the board) the safety
+    check is dropped, any path to the food is taken and tail-following leans
+    towards the food. If that makes no progress either, `stuck` turns true
+    and the caller should stop asking.
+    """
+
+    NEVER = -(2 ** 30)
+    RETRY_TICKS = 4
+
+    def __init__(self, grid_size):
+        self.grid_size = tuple(grid_size)
+        rows, cols = self.grid_size
+        n = rows * cols
+        self.neighbors = []
+        for i in range(n):
+            r, c = divmod(i, cols)
+            self.neighbors.append(tuple(
+                ((r + dr) * cols + c + dc, d) for d, (dr, dc) in enumerate(DIRECTIONS)
+                if 0 <= r + dr < rows and 0 <= c + dc < cols))
+        self._mark = [0] * n
+        self._stamp = 0
+        self._dist = [0] * n
+        self._parent = [-1] * n
+        self.entered = [self.NEVER] * n
+        self.clock = 0
+        self.length = 0
+        self._head = None
+        self.plan = deque()  # cells of the food path still to enter, next first
+        self._plan_food = None
+        self._retry = 0
+        self.hungry = 0  # ticks since the snake last grew
+        self.patience = 2 * n
+        self.searches = 0  # BFS runs, for benchmarking
+
+    @property
+    def stuck(self):
+        """No food for two patience spans, the second without the safety check: time to give up."""
+        return self.hungry >= 2 * self.patience
+
+    def _cell(self, rc):
+        return rc[0] * self.grid_size[1] + rc[1]
+
+    def _sync(self, snake):
+        """Follow the body in O(1) per tick; rebuild after a reset or missed ticks."""
+        head, n = self._cell(snake.head), len(snake)
+        if (self._head is not None and n - self.length in (0, 1)
+                and any(nb == head for nb, _ in self.neighbors[self._head])):
+            self.clock += 1
+            self.entered[head] = self.clock
+            self.hungry = 0 if n > self.length else self.hungry + 1
+            self.length = n
+            if self.entered[self._cell(snake.tail)] == self.clock - n + 1:
+                self._head = head
+                return
+        self.entered = [self.NEVER] * len(self.entered)
+        for i, rc in enumerate(snake):
+            self.entered[self._cell(rc)] = i
+        self.clock, self.length, self._head = n - 1, n, head
+        self.plan.clear()
+
+    def _gap(self, a, b):
+        """Manhattan distance between two cells."""
+        cols = self.grid_size[1]
+        return abs(a // cols - b // cols) + abs(a % cols - b % cols)
+
+    def _free_in(self, cell):
+        """Moves until a cell is empty (0 = empty now)."""
+        return max(0, self.length - (self.clock - self.entered[cell]))
+
+    def _bfs(self, start, goal):
+        """
+        Shortest time-aware path start -> goal as a list of cells (start
+        excluded), or None. The head may enter a cell on move d + 1 if the
+        cell is vacated within d moves; entering the current tail collides.
+        """
+        self.searches += 1
+        self._stamp += 1
+        stamp, mark, dist, parent = self._stamp, self._mark, self._dist, self._parent
+        length, clock, entered, neighbors = self.length, self.clock, self.entered, self.neighbors
+        mark[start] = stamp
+        dist[start] = 0
+        frontier = deque([start])
+        while frontier:
+            cur = frontier.popleft()
+            d = dist[cur]
+            for nb, _ in neighbors[cur]:
+                if mark[nb] == stamp or length - (clock - entered[nb]) > d:
+                    continue
+                mark[nb] = stamp
+                parent[nb] = cur
+                if nb == goal:
+                    path = [nb]
+                    while parent[path[-1]] != start:
+                        path.append(parent[path[-1]])
+                    path.reverse()
+                    return path
+                dist[nb] = d + 1
+                frontier.append(nb)
+        return None
+
+    def _area(self, start):
+        """Number of currently empty cells reachable from start."""
+        self._stamp += 1
+        stamp, mark = self._stamp, self._mark
+        mark[start] = stamp
+        stack, count = [start], 0
+        while stack:
+            cur = stack.pop()
+            count += 1
+            for nb, _ in self.neighbors[cur]:
+                if mark[nb] != stamp and self._free_in(nb) == 0:
+                    mark[nb] = stamp
+                    stack.append(nb)
+        return count
+
+    def _bfs_from_move(self, cell, goal):
+        """_bfs as if the head had just moved into an empty neighbor cell."""
+        saved = self.entered[cell]
+        self.clock += 1
+        self.entered[cell] = self.clock
+        try:
+            return [] if cell == goal else self._bfs(cell, goal)
+        finally:
+            self.entered[cell] = saved
+            self.clock -= 1
+
+    def _safe_after(self, snake, path):
+        """Is the tail still reachable once the head has followed path and eaten at its end?"""
+        k = len(path)
+        # k moves, growing on the last one: the tail advanced k - 1 cells
+        tail = self._cell(snake[k - 1]) if k - 1 < self.length else path[k - 1 - self.length]
+        saved = [(cell, self.entered[cell]) for cell in path]
+        clock, length = self.clock, self.length
+        for cell in path:
+            self.clock += 1
+            self.entered[cell] = self.clock
+        self.length += 1
+        ok = self._bfs(path[-1], tail) is not None
+        for cell, e in reversed(saved):
+            self.entered[cell] = e
+        self.clock, self.length = clock, length
+        return ok
+
+    def _next_cell(self, snake, food):
+        head = self._head
+        if self.plan and self.plan[0] == head:
+            self.plan.popleft()  # the last tick followed the plan
+        if self.plan and self._plan_food == food and self._free_in(self.plan[0]) == 0:
+            return self.plan[0]
+        self.plan.clear()
+        if food is not None and self._retry <= 0:
+            path = self._bfs(head, food)
+            if path and (self.hungry >= self.patience or self._safe_after(snake, path)):
+                self.plan.extend(path)
+                self._plan_food = food
+                return path[0]
+            self._retry = self.RETRY_TICKS
+        self._retry -= 1
+        # follow the tail the long way round, which gives the body room to unwind;
+        # once hungry, prefer the tail-safe move nearest the food to break the loop
+        hungry = food is not None and self.hungry >= self.patience
+        best = None
+        for nb, _ in self.neighbors[head]:
+            if self._free_in(nb) == 0:
+                path = self._bfs_from_move(nb, self._cell(snake.tail))
+                if path is not None:
+                    key = (-self._gap(nb, food) if hungry else 0, len(path))
+                    if best is None or key > best[0]:
+                        best = (key, nb)
+        if best:
+            return best[1]
+        # boxed in: take the empty neighbor with the most room
+        return max((nb for nb, _ in self.neighbors[head] if self._free_in(nb) == 0),
+                   key=self._area, default=None)
+
+    def decide(self, state):
+        """Direction for the next tick of an engine game state."""
+        snake = state["snake"]
+        self._sync(snake)
+        food = self._cell(state["food_pos"]) if state["food_pos"] else None
+        nxt = self._next_cell(snake, food)
+        for nb, d in self.neighbors[self._head]:
+            if nb == nxt:
+                return DIRECTIONS[d]
+        return state["direction"]
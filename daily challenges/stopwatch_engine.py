@@ -0,0 +1,299 @@
+# stopwatch_engine.py
+# Streamlit-free timing for day14.py and the headless tools.
+# RaceTimers keeps hundreds of named timers in NumPy arrays on the
+# time.perf_counter_ns() clock: bulk operations read the clock once, so a mass
+# start gives every athlete the same start instant, and split/standings tables
+# are computed with array operations instead of per-athlete loops.
+# LapLog is the single stopwatch's lap history with incrementally kept stats.
+import csv
+import io
+import time
+
+import numpy as np
+
+try:
+    import pandas as pd  # only needed for Parquet export (plus pyarrow or fastparquet)
+except ImportError:
+    pd = None
+
+NS_PER_S = 1_000_000_000
+
+
+def _grow(arr, size):
+    """arr resized to hold at least size rows (doubling), keeping its contents."""
+    if size <= len(arr):
+        return arr
+    out = np.zeros(max(size, 2 * len(arr)), dtype=arr.dtype)
+    out[:len(arr)] = arr
+    return out
+
+
+# -----------------------
+# Race Timers
+# -----------------------
+class RaceTimers:
+    """
+    Many independent stopwatches addressed by bib number.
+    Per timer: start_ns (perf_counter_ns at the last start), accum_ns (time
+    banked by earlier start/stop cycles) and running. Laps are one flat log of
+    (slot, cumulative_ns) rows in recording order, so a lap is an O(1) append.
+    """
+
+    def __init__(self, capacity=64, lap_capacity=256):
+        self.n = 0
+        self.bibs = np.zeros(capacity, dtype=np.int64)
+        self.names = []
+        self.start_ns = np.zeros(capacity, dtype=np.int64)
+        self.accum_ns = np.zeros(capacity, dtype=np.int64)
+        self.running = np.zeros(capacity, dtype=bool)
+        self.n_laps = 0
+        self.lap_slot = np.zeros(lap_capacity, dtype=np.int32)
+        self.lap_ns = np.zeros(lap_capacity, dtype=np.int64)
+        self._sorted_bibs = np.zeros(0, dtype=np.int64)
+        self._sorted_slots = np.zeros(0, dtype=np.int64)
+
+    def __len__(self):
+        return self.n
+
+    # ---- registration ----
+    def add(self, bibs, names=None):
+        """Register timers; names default to 'Bib <n>'. Duplicate bibs raise ValueError."""
+        bibs = np.atleast_1d(np.asarray(bibs, dtype=np.int64))
+        names = [f"Bib {b}" for b in bibs] if names is None else list(names)
+        if len(names) != len(bibs):
+            raise ValueError("one name per bib")
+        if len(np.unique(bibs)) != len(bibs) or np.isin(bibs, self.bibs[:self.n]).any():
+            raise ValueError("bib numbers must be unique")
+        end = self.n + len(bibs)
+        for field in ("bibs", "start_ns", "accum_ns", "running"):
+            setattr(self, field, _grow(getattr(self, field), end))
+        self.bibs[self.n:end] = bibs
+        self.names.extend(names)
+        self.n = end
+        self._sorted_slots = np.argsort(self.bibs[:end], kind="stable")
+        self._sorted_bibs = self.bibs[:end][self._sorted_slots]
+
+    def slots(self, bibs=None):
+        """Array slots for the given bibs (all timers if None). Unknown bibs raise KeyError."""
+        if bibs is None:
+            return np.arange(self.n)
+        bibs = np.atleast_1d(np.asarray(bibs, dtype=np.int64))
+        if self.n:
+            pos = np.minimum(np.searchsorted(self._sorted_bibs, bibs), self.n - 1)
+            found = self._sorted_bibs[pos] == bibs
+        else:
+            pos, found = np.zeros(len(bibs), dtype=np.int64), np.zeros(len(bibs), dtype=bool)
+        if not found.all():
+            raise KeyError(f"unknown bib(s): {bibs[~found].tolist()}")
+        return self._sorted_slots[pos]
+
+    # ---- clock operations (one clock read per call) ----
+    def start(self, bibs=None, now=None):
+        """Start the stopped timers among bibs; returns how many started."""
+        now = time.perf_counter_ns() if now is None else now
+        slots = self.slots(bibs)
+        slots = slots[~self.running[slots]]
+        self.start_ns[slots] = now
+        self.running[slots] = True
+        return len(slots)
+
+    def stop(self, bibs=None, now=None):
+        """Stop the running timers among bibs, banking their time; returns how many stopped."""
+        now = time.perf_counter_ns() if now is None else now
+        slots = self.slots(bibs)
+        slots = slots[self.running[slots]]
+        self.accum_ns[slots] += now - self.start_ns[slots]
+        self.running[slots] = False
+        return len(slots)
+
+    def lap(self, bibs=None, now=None):
+        """Record a lap for the running timers among bibs; returns how many laps were recorded."""
+        now = time.perf_counter_ns() if now is None else now
+        slots = self.slots(bibs)
+        slots = slots[self.running[slots]]
+        end = self.n_laps + len(slots)
+        self.lap_slot = _grow(self.lap_slot, end)
+        self.lap_ns = _grow(self.lap_ns, end)
+        self.lap_slot[self.n_laps:end] = slots
+        self.lap_ns[self.n_laps:end] = self.accum_ns[slots] + (now - self.start_ns[slots])
+        self.n_laps = end
+        return len(slots)
+
+    def reset(self, bibs=None):
+        """Stop and zero the given timers (all if None) and drop their laps."""
+        slots = self.slots(bibs)
+        self.running[slots] = False
+        self.accum_ns[slots] = 0
+        keep = ~np.isin(self.lap_slot[:self.n_laps], slots)
+        kept = int(keep.sum())
+        self.lap_slot[:kept] = self.lap_slot[:self.n_laps][keep]
+        self.lap_ns[:kept] = self.lap_ns[:self.n_laps][keep]
+        self.n_laps = kept
+
+    def elapsed_ns(self, now=None):
+        """Elapsed time of every timer at one instant."""
+        now = time.perf_counter_ns() if now is None else now
+        n = self.n
+        live = np.where(self.running[:n], now - self.start_ns[:n], 0)
+        return self.accum_ns[:n] + live
+
+    # ---- tables ----
+    def _laps_by_timer(self):
+        """Lap log grouped by slot (recording order kept inside a group) plus per-lap splits."""
+        order = np.argsort(self.lap_slot[:self.n_laps], kind="stable")
+        slot = self.lap_slot[:self.n_laps][order].astype(np.int64)
+        cum = self.lap_ns[:self.n_laps][order]
+        first = np.ones(len(slot), dtype=bool)
+        first[1:] = slot[1:] != slot[:-1]
+        prev = np.zeros_like(cum)
+        prev[1:] = cum[:-1]
+        prev[first] = 0
+        starts = np.flatnonzero(first)
+        lap_no = np.arange(len(slot)) - np.repeat(starts, np.diff(np.append(starts, len(slot)))) + 1
+        return slot, lap_no, cum - prev, cum, starts
+
+    def splits(self):
+        """One row per lap: bib, name, lap number, split and cumulative time (ns)."""
+        slot, lap_no, split, cum, _ = self._laps_by_timer()
+        return {
+            "bib": self.bibs[slot],
+            "name": [self.names[s] for s in slot],
+            "lap": lap_no,
+            "split_ns": split,
+            "cumulative_ns": cum,
+        }
+
+    def standings(self, now=None):
+        """
+        One row per timer, ranked by laps completed (more is better) and then by
+        the cumulative time of the last lap (less is better), like a race
+        leaderboard. Split statistics are 0 for timers without laps.
+        """
+        n = self.n
+        slot, _, split, cum, starts = self._laps_by_timer()
+        laps = np.bincount(slot, minlength=n)[:n]
+        best = np.zeros(n, dtype=np.int64)
+        worst = np.zeros(n, dtype=np.int64)
+        last_cum = np.zeros(n, dtype=np.int64)
+        if len(starts):
+            owners = slot[starts]
+            best[owners] = np.minimum.reduceat(split, starts)
+            worst[owners] = np.maximum.reduceat(split, starts)
+            ends = np.append(starts[1:], len(slot)) - 1
+            last_cum[owners] = cum[ends]
+        mean = np.zeros(n, dtype=np.int64)
+        has = laps > 0
+        mean[has] = (np.bincount(slot, weights=split, minlength=n)[:n][has] / laps[has]).astype(np.int64)
+        order = np.lexsort((last_cum, -laps))
+        rank = np.empty(n, dtype=np.int64)
+        rank[order] = np.arange(1, n + 1)
+        return {
+            "rank": rank,
+            "bib": self.bibs[:n].copy(),
+            "name": list(self.names),
+            "running": self.running[:n].copy(),
+            "elapsed_ns": self.elapsed_ns(now),
+            "laps": laps,
+            "best_split_ns": best,
+            "mean_split_ns": mean,
+            "slowest_split_ns": worst,
+            "last_lap_ns": last_cum,
+        }
+
+
+# -----------------------
+# Lap Log
+# -----------------------
+ROLLING_WINDOW = 5  # laps in the rolling average
+
+
+class LapLog:
+    """
+    Laps of one stopwatch: split and cumulative seconds in growable float64
+    arrays. Fastest, slowest, mean and a rolling average over the last
+    `window` splits are updated on every add, so a lap costs O(1) however many
+    came before it.
+    """
+
+    def __init__(self, capacity=64, window=ROLLING_WINDOW):
+        self.n = 0
+        self.window = window
+        self.split = np.zeros(capacity, dtype=np.float64)
+        self.cumulative = np.zeros(capacity, dtype=np.float64)
+        self.total_split = 0.0
+        self.fastest = -1  # lap index, -1 while empty
+        self.slowest = -1
+        self.window_sum = 0.0
+
+    def __len__(self):
+        return self.n
+
+    def add(self, cumulative):
+        """Record a lap at `cumulative` seconds on the stopwatch; returns its split."""
+        i = self.n
+        split = cumulative - (self.cumulative[i - 1] if i else 0.0)
+        self.split = _grow(self.split, i + 1)
+        self.cumulative = _grow(self.cumulative, i + 1)
+        self.split[i] = split
+        self.cumulative[i] = cumulative
+        self.n = i + 1
+        self.total_split += split
+        if self.fastest < 0 or split < self.split[self.fastest]:
+            self.fastest = i
+        if self.slowest < 0 or split > self.split[self.slowest]:
+            self.slowest = i
+        self.window_sum += split
+        if i >= self.window:
+            self.window_sum -= self.split[i - self.window]
+        return split
+
+    @property
+    def mean(self):
+        return self.total_split / self.n if self.n else 0.0
+
+    @property
+    def rolling_mean(self):
+        """Mean of the last `window` splits (fewer while the log is shorter)."""
+        return self.window_sum / min(self.n, self.window) if self.n else 0.0
+
+    def page(self, page, page_size):
+        """Laps of one page, newest first: (lap numbers, splits, cumulative), each O(page_size)."""
+        hi = max(self.n - page * page_size, 0)
+        lo = max(hi - page_size, 0)
+        return (np.arange(hi, lo, -1), self.split[lo:hi][::-1], self.cumulative[lo:hi][::-1])
+
+    def clear(self):
+        self.__init__(window=self.window)
+
+
+# -----------------------
+# Export
+# -----------------------
+def to_seconds(table):
+    """Copy of a splits/standings table with *_ns columns converted to float *_s seconds."""
+    out = {}
+    for col, values in table.items():
+        if col.endswith("_ns"):
+            out[col[:-3] + "_s"] = np.asarray(values) / NS_PER_S
+        else:
+            out[col] = values
+    return out
+
+
+def table_to_csv(table):
+    """CSV text for a column dict table."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    cols = list(table)
+    writer.writerow(cols)
+    writer.writerows(zip(*(np.asarray(table[c]).tolist() for c in cols)))
+    return buf.getvalue()
+
+
+def table_to_parquet(table):
+    """Parquet bytes for a column dict table; raises ImportError without pandas + a Parquet engine."""
+    if pd is None:
+        raise ImportError("Parquet export needs pandas and pyarrow")
+    buf = io.BytesIO()
+    pd.DataFrame(table).to_parquet(buf, index=False)
+    return buf.getvalue()
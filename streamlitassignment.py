@@ -2,234 +2,1308 @@
 import streamlit as st
 from fpdf import FPDF
 from PIL import Image
-from io import BytesIO
+from io import BytesIO, StringIO
 import textwrap
 import datetime
+import html
+import base64
+import copy
+import os
+import sys
+import argparse
+import csv
+import json
+import re
+import zipfile
+import hashlib
+import tempfile
+import sqlite3
+import uuid
+import threading
+import functools
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
 
-st.set_page_config(page_title="Nurse Resume Builder", layout="wide")
+try:
+    import docx  # python-docx, only needed for DOCX export
+    from docx.shared import Inches
+except ImportError:
+    docx = None
 
 # ---------- Helpers ----------
-MAX_PHOTO_BYTES = 1_000_000  # 1 MB
+MAX_PHOTO_BYTES = 1_000_000  # 1 MB; larger uploads are recompressed, not rejected
+MAX_UPLOAD_BYTES = 25_000_000  # hard cap on what we are willing to decode
 
-def bytes_size_ok(uploaded_file) -> bool:
-    if not uploaded_file:
-        return False
+# Text fields collected by the form (the photo is required separately).
+REQUIRED_FIELDS = [
+    "full_name", "phone", "email", "city_state", "summary",
+    "degree", "institution", "graduation_date", "license_number",
+    "job_title", "duties", "hard_skills", "soft_skills",
+]
+
+def uploaded_size(uploaded_file) -> int:
     try:
-        return uploaded_file.size <= MAX_PHOTO_BYTES
+        return uploaded_file.size
     except Exception:
         uploaded_file.seek(0, 2)
         size = uploaded_file.tell()
         uploaded_file.seek(0)
-        return size <= MAX_PHOTO_BYTES
+        return size
 
-# ---------- PDF Generation ----------
-def generate_pdf(data: dict, photo_bytes: bytes) -> bytes:
+def bytes_size_ok(uploaded_file, limit: int = MAX_UPLOAD_BYTES) -> bool:
+    if not uploaded_file:
+        return False
+    return uploaded_size(uploaded_file) <= limit
+
+# ---------- Photos ----------
+PHOTO_PX = 120  # width of the JPEG embedded in the PDF and shown as preview
+PHOTO_CACHE_ENTRIES = 256
+
+
+def prepare_photo(raw: bytes) -> bytes:
     """
-    Generate a simple, clean PDF resume using fpdf2 with Unicode font.
-    Returns PDF bytes.
+    Decode an uploaded photo once and return the small RGB JPEG used by both
+    the preview and the PDF. JPEGs are decoded at reduced resolution via
+    Image.draft, so multi-megapixel phone photos never get fully decoded.
+    """
+    img = Image.open(BytesIO(raw))
+    w, h = img.size
+    # draft keeps the decoded size >= the request; ask for 2x for a clean downscale
+    img.draft("RGB", (2 * PHOTO_PX, max(1, 2 * PHOTO_PX * h // w)))
+    img = img.convert("RGB")
+    h_size = max(1, round(img.size[1] * PHOTO_PX / img.size[0]))
+    img = img.resize((PHOTO_PX, h_size), Image.LANCZOS)
+    bio = BytesIO()
+    img.save(bio, format="JPEG", quality=90, optimize=True)
+    return bio.getvalue()
+
+
+class PhotoCache:
+    """
+    LRU of processed photos keyed by SHA-256 content hash. Each entry is
+    reachable from both the uploaded bytes and the processed JPEG, so passing
+    the preview JPEG on to generate_pdf is a cache hit rather than a re-encode.
+    """
+
+    def __init__(self, max_entries=PHOTO_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # digest -> processed JPEG bytes
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(raw: bytes) -> str:
+        return hashlib.sha256(raw).hexdigest()
+
+    def get(self, raw: bytes) -> bytes:
+        key = self.digest(raw)
+        with self._lock:
+            jpeg = self._entries.get(key)
+            if jpeg is not None:
+                self._entries.move_to_end(key)
+                return jpeg
+        jpeg = prepare_photo(raw)
+        with self._lock:
+            self._entries[key] = jpeg
+            self._entries[self.digest(jpeg)] = jpeg
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return jpeg
+
+
+@st.cache_resource(show_spinner=False)
+def get_photo_cache() -> PhotoCache:
+    """Process-wide photo cache, shared across reruns and sessions."""
+    return PhotoCache()
+
+# ---------- Fonts ----------
+FONT_DIR = os.path.dirname(os.path.abspath(__file__))
+FONT_FAMILY = 'DejaVu'
+# Real regular and bold faces. If the bold file is missing we fall back to the
+# regular face so generation still works, just without true bold glyphs.
+FONT_FACES = {
+    '': 'DejaVuSans.ttf',
+    'B': 'DejaVuSans-Bold.ttf',
+}
+
+
+class FontRegistry:
+    """
+    Parses each TTF face once per process and installs the parsed font
+    (metrics, cmap and glyph tables) into every new FPDF document.
+    Only the per-document glyph subset is created fresh for each PDF.
+    """
+
+    def __init__(self, family=FONT_FAMILY, faces=None, font_dir=FONT_DIR):
+        self.family = family
+        self.faces = dict(faces or FONT_FACES)
+        self.font_dir = font_dir
+        self._fonts = {}  # fontkey -> parsed fpdf2 TTFFont
+        self._advances = {}  # style -> GlyphAdvances
+        self._measure = None  # scratch document used only for measuring glyphs
+        self._lock = threading.Lock()
+
+    def font_path(self, style: str) -> str:
+        path = os.path.join(self.font_dir, self.faces[style])
+        if not os.path.exists(path) and style:
+            path = os.path.join(self.font_dir, self.faces[''])
+        return path
+
+    def load(self):
+        """Parse every face once. Safe to call repeatedly."""
+        if self._fonts:
+            return self
+        seed = FPDF(format='A4')
+        for style in self.faces:
+            seed.add_font(self.family, style, self.font_path(style))
+        prefix = self.family.lower()
+        self._fonts = {k: v for k, v in seed.fonts.items() if k.startswith(prefix)}
+        return self
+
+    def install(self, pdf: FPDF) -> FPDF:
+        """Make the cached faces available on `pdf` without re-parsing the TTF files."""
+        self.load()
+        for fontkey, font in self._fonts.items():
+            if fontkey in pdf.fonts:
+                continue
+            try:
+                clone = copy.copy(font)
+                clone.i = len(pdf.fonts) + 1
+                # glyph subsets are per document; everything else is shared
+                clone.subset = type(font.subset)(clone, [ord(ch) for ch in pdf.str_alias_nb_pages])
+                pdf.fonts[fontkey] = clone
+            except Exception:
+                # unknown fpdf2 internals: fall back to a regular (uncached) load
+                style = fontkey[len(self.family):].upper()
+                pdf.add_font(self.family, style, self.font_path(style))
+        return pdf
+
+    def advances(self, style: str = '') -> "GlyphAdvances":
+        """Cached per-glyph advance widths for one face."""
+        table = self._advances.get(style)
+        if table is None:
+            with self._lock:
+                if self._measure is None:
+                    self._measure = self.install(FPDF(format='A4'))
+                table = self._advances.setdefault(style, GlyphAdvances(self, style))
+        return table
+
+
+class GlyphAdvances(dict):
+    """
+    char -> advance width in mm at 1 pt for one face. Each glyph is measured
+    once from the loaded font; widths scale linearly with the font size.
     """
+
+    def __init__(self, registry: FontRegistry, style: str):
+        super().__init__()
+        self._registry = registry
+        self._style = style
+
+    def __missing__(self, ch: str) -> float:
+        with self._registry._lock:
+            pdf = self._registry._measure
+            pdf.set_font(self._registry.family, self._style, 100)
+            width = self[ch] = pdf.get_string_width(ch) / 100
+        return width
+
+    def width(self, text: str, size: float) -> float:
+        return sum(self[ch] for ch in text) * size
+
+
+@st.cache_resource(show_spinner=False)
+def get_font_registry() -> FontRegistry:
+    """Process-wide font registry, shared across reruns and sessions."""
+    return FontRegistry().load()
+
+
+def new_pdf() -> FPDF:
+    """A4 document with page breaks set up and the cached DejaVu faces installed."""
     pdf = FPDF(format='A4')
     pdf.set_auto_page_break(auto=True, margin=15)
-    pdf.add_page()
-
-    # --- Add Unicode font ---
-    # Make sure DejaVuSans.ttf is in the same folder as this script
-    pdf.add_font('DejaVu', '', 'DejaVuSans.ttf', uni=True)
-    pdf.add_font('DejaVu', 'B', 'DejaVuSans.ttf', uni=True)
-
-    # Header: name and contact
-    pdf.set_font('DejaVu', 'B', 18)
-    pdf.cell(0, 8, txt=data['full_name'], ln=1)
-    pdf.set_font('DejaVu', '', 10)
-    contact = f"{data['phone']}  |  {data['email']}  |  {data['city_state']}"
-    pdf.cell(0, 6, txt=contact, ln=1)
-    pdf.ln(4)
-
-    # Insert photo on the right top if present
-    if photo_bytes:
+    get_font_registry().install(pdf)
+    return pdf
+
+# ---------- Text Layout ----------
+@functools.lru_cache(maxsize=8192)
+def layout_lines(text: str, style: str, size: float, width: float) -> tuple:
+    """
+    Break `text` into lines no wider than `width` mm in a single greedy pass,
+    using the cached glyph advances of the DejaVu face `style` at `size` pt.
+    Explicit newlines are kept; words wider than a line are split by glyph.
+    Memoized per (text, face, size, width).
+    """
+    adv = get_font_registry().advances(style)
+    space = adv[" "] * size
+    lines = []
+    for para in text.split("\n"):
+        line, line_w = [], 0.0
+        for word in para.split():
+            word_w = adv.width(word, size)
+            if word_w > width:
+                if line:
+                    lines.append(" ".join(line))
+                chunk, chunk_w = "", 0.0
+                for ch in word:
+                    ch_w = adv[ch] * size
+                    if chunk and chunk_w + ch_w > width:
+                        lines.append(chunk)
+                        chunk, chunk_w = "", 0.0
+                    chunk += ch
+                    chunk_w += ch_w
+                line, line_w = [chunk], chunk_w
+            elif line and line_w + space + word_w > width:
+                lines.append(" ".join(line))
+                line, line_w = [word], word_w
+            else:
+                line_w += (space if line else 0.0) + word_w
+                line.append(word)
+        lines.append(" ".join(line))
+    return tuple(lines)
+
+
+def write_block(pdf: FPDF, lines, h: float, indent: float = 0):
+    """Emit pre-broken lines as one multi_cell and return to the left margin."""
+    pdf.set_x(pdf.l_margin + indent)
+    pdf.multi_cell(0, h, "\n".join(lines), new_x="LMARGIN", new_y="NEXT")
+
+
+def text_width(pdf: FPDF) -> float:
+    """Usable line width (mm) of a full-width multi_cell at the current x."""
+    return pdf.w - pdf.r_margin - pdf.x - 2 * pdf.c_margin
+
+
+def write_paragraph(pdf: FPDF, text: str, style: str, size: float, h: float):
+    pdf.set_font(FONT_FAMILY, style, size)
+    pdf.set_x(pdf.l_margin)
+    write_block(pdf, layout_lines(text, style, size, text_width(pdf)), h)
+
+
+def bullet_lines(items, style: str, size: float, width: float) -> list:
+    """Lay out a bullet list as hanging-indent lines; linear in the total text length."""
+    adv = get_font_registry().advances(style)
+    bullet = "• "
+    pad = " " * max(1, round(adv.width(bullet, size) / (adv[" "] * size)))
+    inner = width - adv.width(bullet, size)
+    lines = []
+    for item in items:
+        wrapped = layout_lines(item, style, size, inner)
+        lines.append(bullet + wrapped[0])
+        lines.extend(pad + cont for cont in wrapped[1:])
+    return lines
+
+# ---------- Document Model ----------
+# section -> (heading, data fields it binds)
+SECTION_SCHEMA = {
+    "header": ("", ("full_name", "phone", "email", "city_state")),
+    "summary": ("Professional Summary", ("summary",)),
+    "education": ("Education", ("degree", "institution", "graduation_date")),
+    "licenses": ("Licenses & Certifications", ("license_number",)),
+    "experience": ("Professional Experience", ("job_title", "duties")),
+    "skills": ("Skills", ("hard_skills", "soft_skills")),
+}
+
+
+def _comma_list(value: str) -> str:
+    return ", ".join([s.strip() for s in value.split(",") if s.strip()])
+
+
+class ResumeSection:
+    """One body section: a heading, its paragraphs and an optional bullet list."""
+
+    __slots__ = ("key", "title", "paragraphs", "bullets")
+
+    def __init__(self, key: str, paragraphs, bullets=()):
+        self.key = key
+        self.title = SECTION_SCHEMA[key][0]
+        self.paragraphs = tuple(paragraphs)
+        self.bullets = tuple(bullets)
+
+
+class ResumeDocument:
+    """
+    Intermediate representation of a resume, built once from the form data.
+    All export backends (PDF, HTML, DOCX, TXT) render from it, so parsing the
+    duties and skills lists and composing each line happens only once.
+    """
+
+    def __init__(self, data: dict):
+        d = normalize_data(data)
+        self.fields = d
+        self.name = d["full_name"]
+        self.contact = f"{d['phone']}  |  {d['email']}  |  {d['city_state']}"
+        self.sections = {
+            "summary": ResumeSection("summary", [d["summary"]]),
+            "education": ResumeSection(
+                "education", [f"{d['degree']} — {d['institution']} ({d['graduation_date']})"]),
+            "licenses": ResumeSection("licenses", [f"License Number: {d['license_number']}"]),
+            "experience": ResumeSection(
+                "experience", [f"Job Title: {d['job_title']}"],
+                [line.strip() for line in d["duties"].splitlines() if line.strip()]),
+            "skills": ResumeSection("skills", [f"Hard Skills: {_comma_list(d['hard_skills'])}",
+                                               f"Soft Skills: {_comma_list(d['soft_skills'])}"]),
+        }
+
+    def body(self, order=None):
+        """Sections in `order` (section keys, e.g. a RenderPlan's), else the default (classic) order."""
+        return [self.sections[k] for k in (order or SECTION_SCHEMA) if k != "header"]
+
+
+def as_document(data) -> ResumeDocument:
+    return data if isinstance(data, ResumeDocument) else ResumeDocument(data)
+
+
+# ---------- Templates ----------
+
+# Built-in layouts. Fonts are (style, size pt, line height mm); spacing in mm.
+TEMPLATES = {
+    "classic": {
+        "margins": (10, 10, 10),
+        "sections": ["header", "summary", "education", "licenses", "experience", "skills"],
+        "name": ('B', 18, 8), "contact": ('', 10, 6),
+        "heading": ('B', 12, 8), "body": ('', 11, 6), "footer": ('', 9, 8),
+        "photo": {"x": 150, "y": 10, "w": 35},
+        "gap": 2, "bullet_indent": 6, "rule": False, "uppercase_headings": False,
+    },
+    "compact": {
+        "margins": (12, 10, 12),
+        "sections": ["header", "summary", "experience", "skills", "education", "licenses"],
+        "name": ('B', 16, 7), "contact": ('', 9, 5),
+        "heading": ('B', 11, 7), "body": ('', 10, 5), "footer": ('', 8, 6),
+        "photo": {"x": 170, "y": 10, "w": 28},
+        "gap": 1, "bullet_indent": 4, "rule": False, "uppercase_headings": False,
+    },
+    "modern": {
+        "margins": (18, 14, 18),
+        "sections": ["header", "summary", "experience", "education", "licenses", "skills"],
+        "name": ('B', 20, 9), "contact": ('', 10, 6),
+        "heading": ('B', 11, 8), "body": ('', 10.5, 5.5), "footer": ('', 8, 8),
+        "photo": {"x": 157, "y": 14, "w": 35},
+        "gap": 3, "bullet_indent": 5, "rule": True, "uppercase_headings": True,
+    },
+}
+DEFAULT_TEMPLATE = "classic"
+
+
+def _write_line(pdf, font, text: str, align='L'):
+    pdf.set_font(FONT_FAMILY, font[0], font[1])
+    pdf.cell(0, font[2], text, new_x="LMARGIN", new_y="NEXT", align=align)
+
+
+def _op_line(pdf, doc, photo, *, font, attr):
+    _write_line(pdf, font, getattr(doc, attr))
+
+
+def _op_ln(pdf, doc, photo, *, h):
+    pdf.ln(h)
+
+
+def _op_heading(pdf, doc, photo, *, title, font, rule):
+    _write_line(pdf, font, title)
+    if rule:
+        y = pdf.get_y()
+        pdf.line(pdf.l_margin, y, pdf.w - pdf.r_margin, y)
+        pdf.ln(1)
+
+
+def _op_section_body(pdf, doc, photo, *, key, font, indent):
+    section = doc.sections[key]
+    write_paragraph(pdf, "\n".join(section.paragraphs), font[0], font[1], font[2])
+    if section.bullets:
+        pdf.ln(1)
+        pdf.set_x(pdf.l_margin + indent)
+        write_block(pdf, bullet_lines(section.bullets, font[0], font[1], text_width(pdf)), font[2], indent=indent)
+
+
+def _op_photo(pdf, doc, photo, *, x, y, w):
+    # Insert photo at a fixed position if present; a photo that will not decode is an error
+    if photo:
         try:
-            img = Image.open(BytesIO(photo_bytes)).convert("RGB")
-            max_w = 120
-            w_percent = max_w / float(img.size[0])
-            h_size = int(float(img.size[1]) * float(w_percent))
-            img = img.resize((max_w, h_size))
-            bio = BytesIO()
-            img.save(bio, format="JPEG")
-            bio.seek(0)
-            x_position = 150
-            y_position = 10
-            pdf.image(bio, x=x_position, y=y_position, w=35)
-        except Exception:
-            pass
-
-    pdf.ln(4)
-
-    # Professional summary
-    pdf.set_font('DejaVu', 'B', 12)
-    pdf.cell(0, 8, txt="Professional Summary", ln=1)
-    pdf.set_font('DejaVu', '', 11)
-    for line in textwrap.wrap(data['summary'], width=100):
-        pdf.multi_cell(0, 6, line)
-    pdf.ln(2)
-
-    # Education
-    pdf.set_font('DejaVu', 'B', 12)
-    pdf.cell(0, 8, txt="Education", ln=1)
-    pdf.set_font('DejaVu', '', 11)
-    edu_line = f"{data['degree']} — {data['institution']} ({data['graduation_date']})"
-    pdf.multi_cell(0, 6, edu_line)
-    pdf.ln(2)
-
-    # Licenses & Certifications
-    pdf.set_font('DejaVu', 'B', 12)
-    pdf.cell(0, 8, txt="Licenses & Certifications", ln=1)
-    pdf.set_font('DejaVu', '', 11)
-    pdf.multi_cell(0, 6, f"License Number: {data['license_number']}")
-    pdf.ln(2)
-
-    # Professional Experience
-    pdf.set_font('DejaVu', 'B', 12)
-    pdf.cell(0, 8, txt="Professional Experience", ln=1)
-    pdf.set_font('DejaVu', '', 11)
-    pdf.multi_cell(0, 6, f"Job Title: {data['job_title']}")
-    pdf.ln(1)
-    duties = [d.strip() for d in data['duties'].splitlines() if d.strip()]
-    for duty in duties:
-        wrapped = textwrap.wrap(duty, width=95)
-        if wrapped:
-            pdf.cell(6)  # small indent for bullet
-            pdf.cell(2, 5, txt="•")
-            pdf.multi_cell(0, 6, " " + wrapped[0])
-            for cont in wrapped[1:]:
-                pdf.cell(8)
-                pdf.multi_cell(0, 6, cont)
-    pdf.ln(2)
-
-    # Skills
-    pdf.set_font('DejaVu', 'B', 12)
-    pdf.cell(0, 8, txt="Skills", ln=1)
-    pdf.set_font('DejaVu', '', 11)
-    hard = ", ".join([s.strip() for s in data['hard_skills'].split(",") if s.strip()])
-    soft = ", ".join([s.strip() for s in data['soft_skills'].split(",") if s.strip()])
-    pdf.multi_cell(0, 6, f"Hard Skills: {hard}")
-    pdf.multi_cell(0, 6, f"Soft Skills: {soft}")
-    pdf.ln(6)
+            jpeg = get_photo_cache().get(photo)
+        except Exception as e:
+            raise ValueError(f"photo could not be decoded ({type(e).__name__})") from e
+        pdf.image(BytesIO(jpeg), x=x, y=y, w=w)
 
+
+def _op_footer(pdf, doc, photo, *, font):
     # Footer: generation timestamp
-    pdf.set_font('DejaVu', '', 9)
-    pdf.cell(0, 8, txt=f"Generated on {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}", ln=1, align='R')
+    stamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M')
+    _write_line(pdf, font, f"Generated on {stamp}", align='R')
 
-    return pdf.output(dest='S').encode('latin-1')
 
-# ---------- UI ----------
-st.title("🩺 Nurse Resume Builder — Streamlit")
-
-col1, col2 = st.columns([2, 1])
-with col1:
-    st.header("Enter your details")
-
-    full_name = st.text_input("Full Name", value="")
-    phone = st.text_input("Phone Number", value="")
-    email = st.text_input("Email Address", value="")
-    city_state = st.text_input("City, State", value="")
-
-    st.subheader("Professional Summary")
-    summary = st.text_area("Write a short professional summary", height=120)
-
-    st.subheader("Photo Upload")
-    photo_file = st.file_uploader("Upload professional photo (≤ 1 MB)", type=["png", "jpg", "jpeg"])
-    photo_ok = None
-    if photo_file:
-        if bytes_size_ok(photo_file):
-            photo_ok = True
+def _compile_section(section: str, spec: dict) -> list:
+    """Turn one schema section into bound ops using the template's resolved styles."""
+    op = functools.partial
+
+    if section == "header":
+        ops = [op(_op_line, font=spec["name"], attr="name"),
+               op(_op_line, font=spec["contact"], attr="contact"),
+               op(_op_ln, h=4)]
+        if spec["photo"]:
+            ops.append(op(_op_photo, **spec["photo"]))
+        return ops + [op(_op_ln, h=4)]
+
+    title = SECTION_SCHEMA[section][0]
+    if spec["uppercase_headings"]:
+        title = title.upper()
+    return [op(_op_heading, title=title, font=spec["heading"], rule=spec["rule"]),
+            op(_op_section_body, key=section, font=spec["body"], indent=spec["bullet_indent"]),
+            op(_op_ln, h=spec["gap"])]
+
+
+class RenderPlan:
+    """
+    A compiled template: page setup plus a flat list of ops with every style
+    already resolved. Rendering a record only binds its data to the ops.
+    `sections` lets the other export formats follow the same section order.
+    """
+
+    def __init__(self, name: str, margins: tuple, ops: list, sections=()):
+        self.name = name
+        self.margins = margins
+        self.ops = tuple(ops)
+        self.sections = tuple(sections)
+
+    def build(self, data, photo_bytes: bytes) -> FPDF:
+        """`data` is the form dict or an already built ResumeDocument."""
+        doc = as_document(data)
+        pdf = new_pdf()
+        pdf.set_margins(*self.margins)
+        pdf.add_page()
+        for op in self.ops:
+            op(pdf, doc, photo_bytes)
+        return pdf
+
+    def render(self, data: dict, photo_bytes: bytes) -> bytearray:
+        """fpdf2's own output buffer, returned as is (no str round trip, no copy)."""
+        return self.build(data, photo_bytes).output()
+
+    def render_to(self, data: dict, photo_bytes: bytes, sink):
+        """Write the PDF straight into a binary file object."""
+        self.build(data, photo_bytes).output(sink)
+
+
+@functools.lru_cache(maxsize=None)
+def compile_template(name: str = DEFAULT_TEMPLATE) -> RenderPlan:
+    """Validate a template spec against SECTION_SCHEMA and compile it once into a RenderPlan."""
+    if name not in TEMPLATES:
+        raise ValueError(f"Unknown template '{name}'. Choose from: {', '.join(TEMPLATES)}")
+    spec = TEMPLATES[name]
+    ops = []
+    for section in spec["sections"]:
+        if section not in SECTION_SCHEMA:
+            raise ValueError(f"Template '{name}' uses unknown section '{section}'")
+        ops += _compile_section(section, spec)
+    # footer sits a little below the last section
+    ops += [functools.partial(_op_ln, h=4), functools.partial(_op_footer, font=spec["footer"])]
+    return RenderPlan(name, spec["margins"], ops, spec["sections"])
+
+
+# ---------- PDF Generation ----------
+def generate_pdf(data: dict, photo_bytes: bytes, template: str = DEFAULT_TEMPLATE) -> bytearray:
+    """
+    Generate a simple, clean PDF resume using fpdf2 with Unicode font.
+    `template` names one of TEMPLATES; its render plan is compiled once per process.
+    Returns the PDF as a bytes-like bytearray.
+    """
+    # Unicode fonts come from the process-wide registry.
+    # Make sure DejaVuSans.ttf and DejaVuSans-Bold.ttf are in the same folder as this script
+    return compile_template(template).render(data, photo_bytes)
+
+
+def generate_pdf_to(data: dict, photo_bytes: bytes, sink, template: str = DEFAULT_TEMPLATE):
+    """Like generate_pdf, but writes into a binary file object instead of returning bytes."""
+    compile_template(template).render_to(data, photo_bytes, sink)
+
+# ---------- Export Formats ----------
+TXT_WIDTH = 80
+
+
+def _render_pdf(doc: ResumeDocument, photo_jpeg: bytes, template: str, sink):
+    compile_template(template).render_to(doc, photo_jpeg, sink)
+
+
+def _render_txt(doc: ResumeDocument, photo_jpeg: bytes, template: str, sink):
+    # plain text is read in a fixed-width font, so wrap by character columns, not PDF millimetres
+    out = [doc.name, doc.contact, "=" * TXT_WIDTH]
+    for section in doc.body(compile_template(template).sections):
+        out += ["", section.title.upper(), "-" * len(section.title)]
+        for para in section.paragraphs:
+            out += textwrap.wrap(para, TXT_WIDTH) or [""]
+        for item in section.bullets:
+            out += textwrap.wrap(item, TXT_WIDTH, initial_indent="  • ", subsequent_indent="    ")
+    sink.write(("\n".join(out) + "\n").encode("utf-8"))
+
+
+def _render_html(doc: ResumeDocument, photo_jpeg: bytes, template: str, sink):
+    esc = html.escape
+    parts = [
+        "<!DOCTYPE html>",
+        '<html lang="en"><head><meta charset="utf-8">',
+        f"<title>{esc(doc.name)} — Resume</title>",
+        "<style>body{font-family:'DejaVu Sans',Arial,sans-serif;max-width:48rem;margin:2rem auto;"
+        "line-height:1.45;color:#111}header{display:flex;justify-content:space-between;gap:1rem}"
+        "h1{margin:0}h2{font-size:1.1rem;border-bottom:1px solid #ccc;margin-top:1.4rem}"
+        ".contact{color:#444}</style>",
+        "</head><body>",
+        f'<header><div><h1>{esc(doc.name)}</h1><div class="contact">{esc(doc.contact)}</div></div>',
+    ]
+    if photo_jpeg:
+        b64 = base64.b64encode(get_photo_cache().get(photo_jpeg)).decode("ascii")
+        parts.append(f'<img src="data:image/jpeg;base64,{b64}" alt="Photo of {esc(doc.name)}" width="{PHOTO_PX}">')
+    parts.append("</header>")
+    for section in doc.body(compile_template(template).sections):
+        parts.append(f"<section><h2>{esc(section.title)}</h2>")
+        parts += [f"<p>{esc(para)}</p>" for para in section.paragraphs]
+        if section.bullets:
+            parts.append("<ul>" + "".join(f"<li>{esc(item)}</li>" for item in section.bullets) + "</ul>")
+        parts.append("</section>")
+    parts.append("</body></html>")
+    sink.write("\n".join(parts).encode("utf-8"))
+
+
+def _render_docx(doc: ResumeDocument, photo_jpeg: bytes, template: str, sink):
+    if docx is None:
+        raise RuntimeError("DOCX export needs python-docx (pip install python-docx)")
+    document = docx.Document()
+    document.add_heading(doc.name, level=0)
+    document.add_paragraph(doc.contact)
+    if photo_jpeg:
+        document.add_picture(BytesIO(get_photo_cache().get(photo_jpeg)), width=Inches(1.2))
+    for section in doc.body(compile_template(template).sections):
+        document.add_heading(section.title, level=1)
+        for para in section.paragraphs:
+            document.add_paragraph(para)
+        for item in section.bullets:
+            document.add_paragraph(item, style="List Bullet")
+    bio = BytesIO()  # python-docx wants a seekable target
+    document.save(bio)
+    sink.write(bio.getbuffer())
+
+
+# format -> (renderer(doc, photo_jpeg, template, sink), mime type, file extension)
+EXPORT_FORMATS = {
+    "pdf": (_render_pdf, "application/pdf", ".pdf"),
+    "docx": (_render_docx, "application/vnd.openxmlformats-officedocument.wordprocessingml.document", ".docx"),
+    "html": (_render_html, "text/html", ".html"),
+    "txt": (_render_txt, "text/plain", ".txt"),
+}
+
+
+def _run_exports(formats, render_one) -> tuple:
+    """Run render_one(fmt) for every format concurrently; return (results, errors)."""
+    results, errors = {}, {}
+    with ThreadPoolExecutor(max_workers=max(1, len(formats))) as pool:
+        futures = {fmt: pool.submit(render_one, fmt) for fmt in formats}
+    for fmt, fut in futures.items():
+        try:
+            results[fmt] = fut.result()
+        except Exception as e:
+            errors[fmt] = f"{type(e).__name__}: {e}"
+    return results, errors
+
+
+def export_resume(data, photo_jpeg: bytes, formats=tuple(EXPORT_FORMATS),
+                  template: str = DEFAULT_TEMPLATE) -> tuple:
+    """
+    Render the resume in several formats from one ResumeDocument, with the
+    backends running concurrently. Returns ({format: bytes}, {format: error}).
+    """
+    doc = as_document(data)
+
+    def render_one(fmt):
+        sink = BytesIO()
+        EXPORT_FORMATS[fmt][0](doc, photo_jpeg, template, sink)
+        return sink.getvalue()
+
+    return _run_exports(formats, render_one)
+
+# ---------- PDF Store ----------
+PDF_STORE_DIR = os.path.join(tempfile.gettempdir(), "nurse_resume_pdfs")
+PDF_STORE_MAX_BYTES = 256 * 1024 * 1024
+
+
+class _HashingWriter:
+    """File wrapper that hashes everything written through it."""
+
+    def __init__(self, f):
+        self._f = f
+        self.sha = hashlib.sha256()
+
+    def write(self, b):
+        self.sha.update(b)
+        return self._f.write(b)
+
+
+class PdfStore:
+    """
+    Content-addressed, size-bounded on-disk store for generated PDFs (and the
+    other export formats).
+    Sessions keep only the digest; PDFs are rendered straight into a file
+    here and read back only when a download button needs them. The least
+    recently used files are evicted once the store exceeds max_bytes;
+    on_evict(digests) is then called so indexes pointing at them can be pruned.
+    """
+
+    def __init__(self, root=PDF_STORE_DIR, max_bytes=PDF_STORE_MAX_BYTES, on_evict=None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self._lock = threading.Lock()
+        self._sizes = OrderedDict()  # digest -> size, oldest first
+        os.makedirs(root, exist_ok=True)
+        entries = []
+        for name in os.listdir(root):
+            if name.endswith(".out"):
+                info = os.stat(os.path.join(root, name))
+                entries.append((info.st_mtime, name[:-4], info.st_size))
+        for _, digest, size in sorted(entries):
+            self._sizes[digest] = size
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.root, digest + ".out")
+
+    def put_rendered(self, render) -> str:
+        """Call render(sink) to write a document into the store and return its digest."""
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                writer = _HashingWriter(f)
+                render(writer)
+            digest = writer.sha.hexdigest()
+            size = os.path.getsize(tmp)
+            os.replace(tmp, self._path(digest))
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        with self._lock:
+            self._sizes.pop(digest, None)
+            self._sizes[digest] = size
+            evicted = self._evict()
+        if evicted and self.on_evict:
+            self.on_evict(evicted)
+        return digest
+
+    def get(self, digest: str):
+        """Stored bytes for `digest`, or None if they were evicted."""
+        try:
+            with open(self._path(digest), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        with self._lock:
+            if digest in self._sizes:
+                self._sizes.move_to_end(digest)
+        return data
+
+    def __contains__(self, digest: str) -> bool:
+        return os.path.exists(self._path(digest))
+
+    def digests(self) -> set:
+        with self._lock:
+            return set(self._sizes)
+
+    def _evict(self) -> list:
+        """Drop least recently used files until under max_bytes; returns their digests."""
+        evicted = []
+        total = sum(self._sizes.values())
+        while total > self.max_bytes and len(self._sizes) > 1:
+            digest, size = self._sizes.popitem(last=False)
+            total -= size
+            evicted.append(digest)
             try:
-                st.image(photo_file, caption="Uploaded photo preview", width=150)
-            except Exception:
-                st.write("Preview not available.")
+                os.remove(self._path(digest))
+            except OSError:
+                pass
+        return evicted
+
+
+@st.cache_resource(show_spinner=False)
+def get_pdf_store() -> PdfStore:
+    """Process-wide PDF store, shared across sessions; evictions prune the render cache."""
+    drafts = get_draft_store()
+    store = PdfStore(on_evict=drafts.forget_renders)
+    drafts.prune_renders(store.digests())
+    return store
+
+# ---------- Drafts ----------
+DRAFTS_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".resume_drafts.sqlite3")
+
+
+def normalize_data(data: dict) -> dict:
+    """Canonical form of the form fields: trimmed, LF newlines, no trailing spaces."""
+    return {
+        k: "\n".join(line.rstrip() for line in str(data.get(k) or "").strip().splitlines())
+        for k in REQUIRED_FIELDS
+    }
+
+
+def render_key(data: dict, photo_jpeg: bytes, template: str) -> str:
+    """Hash of everything that affects the rendered PDF."""
+    h = hashlib.sha256(json.dumps(normalize_data(data), sort_keys=True).encode("utf-8"))
+    h.update(hashlib.sha256(photo_jpeg or b"").digest())
+    h.update(template.encode("utf-8"))
+    return h.hexdigest()
+
+
+class DraftStore:
+    """
+    SQLite store for resume drafts (form fields plus the processed photo) and
+    for the render cache mapping render_key -> PdfStore digest.
+    """
+
+    def __init__(self, path=DRAFTS_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS drafts ("
+                " draft_id TEXT PRIMARY KEY, data TEXT NOT NULL, photo BLOB,"
+                " template TEXT, updated_at REAL NOT NULL)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS renders ("
+                " render_key TEXT PRIMARY KEY, pdf_digest TEXT NOT NULL, created_at REAL NOT NULL)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS renders_by_digest ON renders (pdf_digest)")
+
+    def save(self, draft_id: str, data: dict, photo_jpeg: bytes, template: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO drafts (draft_id, data, photo, template, updated_at) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT(draft_id) DO UPDATE SET data=excluded.data, photo=excluded.photo,"
+                " template=excluded.template, updated_at=excluded.updated_at",
+                (draft_id, json.dumps(data), photo_jpeg, template, time.time()))
+
+    def load(self, draft_id: str):
+        """(data, photo_jpeg, template) for a draft, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, photo, template FROM drafts WHERE draft_id = ?", (draft_id,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1], row[2] or DEFAULT_TEMPLATE
+
+    def cached_render(self, key: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT pdf_digest FROM renders WHERE render_key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def remember_render(self, key: str, pdf_digest: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO renders (render_key, pdf_digest, created_at) VALUES (?, ?, ?)",
+                (key, pdf_digest, time.time()))
+
+    def forget_renders(self, pdf_digests):
+        """Drop render cache rows pointing at the given (evicted) store digests."""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM renders WHERE pdf_digest = ?", [(d,) for d in pdf_digests])
+
+    def prune_renders(self, live_digests):
+        """Drop render cache rows whose store file no longer exists."""
+        with self._lock:
+            known = {r[0] for r in self._conn.execute("SELECT DISTINCT pdf_digest FROM renders")}
+        self.forget_renders(known - set(live_digests))
+
+
+@st.cache_resource(show_spinner=False)
+def get_draft_store() -> DraftStore:
+    """Process-wide draft store (one SQLite connection shared behind a lock)."""
+    return DraftStore()
+
+
+def render_cached(data: dict, photo_jpeg: bytes, template: str = DEFAULT_TEMPLATE,
+                  formats=("pdf",)) -> tuple:
+    """
+    Return ({format: store digest}, {format: error}, {formats served from cache}).
+    An unchanged resume (same normalized data, photo, template and format) is
+    served from the store without re-rendering; the rest are rendered
+    concurrently from one ResumeDocument straight into the store.
+    Note a cached PDF keeps the footer timestamp of its first render.
+    """
+    drafts, store = get_draft_store(), get_pdf_store()
+    digests, keys = {}, {}
+    for fmt in formats:
+        keys[fmt] = render_key(data, photo_jpeg, f"{template}:{fmt}")
+        digest = drafts.cached_render(keys[fmt])
+        if digest and digest in store:
+            digests[fmt] = digest
+    hits = set(digests)
+    missing = [fmt for fmt in formats if fmt not in digests]
+    if not missing:
+        return digests, {}, hits
+
+    doc = ResumeDocument(data)
+
+    def render_one(fmt):
+        render = EXPORT_FORMATS[fmt][0]
+        return store.put_rendered(lambda sink: render(doc, photo_jpeg, template, sink))
+
+    rendered, errors = _run_exports(missing, render_one)
+    for fmt, digest in rendered.items():
+        drafts.remember_render(keys[fmt], digest)
+    digests.update(rendered)
+    return digests, errors, hits
+
+
+# ---------- Batch Generation ----------
+PHOTO_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def resume_filename(full_name: str) -> str:
+    return f"{full_name.strip().replace(' ', '_')}_Resume.pdf" if full_name.strip() else "resume.pdf"
+
+
+def load_records(path: str) -> list:
+    """
+    Read form records from a .csv (header row = field names) or .jsonl file.
+    A JSONL line that is not valid JSON, or not a JSON object, comes back as a
+    ValueError in its place so the caller can report it as a row error.
+    """
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        if not path.lower().endswith((".jsonl", ".ndjson")):
+            return list(csv.DictReader(f))
+        records = []
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                record = ValueError(f"invalid JSON: {e}")
+            if not isinstance(record, (dict, ValueError)):
+                record = ValueError(f"expected a JSON object, got {type(record).__name__}")
+            records.append(record)
+        return records
+
+
+def find_photo(photos_dir: str, record: dict):
+    """
+    Locate a record's photo: an explicit `photo` column (file name inside
+    photos_dir) wins, otherwise <full name with underscores>.jpg/.jpeg/.png.
+    """
+    if not photos_dir:
+        return None
+    explicit = str(record.get("photo") or "").strip()
+    if explicit:
+        path = os.path.join(photos_dir, explicit)
+        return path if os.path.isfile(path) else None
+    stem = re.sub(r"\s+", "_", str(record.get("full_name") or "").strip())
+    for ext in PHOTO_EXTENSIONS:
+        for name in (stem + ext, stem.lower() + ext):
+            path = os.path.join(photos_dir, name)
+            if os.path.isfile(path):
+                return path
+    return None
+
+
+def _render_batch_record(job):
+    """Worker: validate and render one record. Never raises; errors are returned."""
+    row, record, photo_path, template = job
+    try:
+        data = {k: str(record.get(k) or "").strip() for k in REQUIRED_FIELDS}
+        missing = [k for k in REQUIRED_FIELDS if not data[k]]
+        if missing:
+            raise ValueError("missing fields: " + ", ".join(missing))
+        if not photo_path:
+            raise ValueError("photo not found")
+        with open(photo_path, "rb") as f:
+            photo_bytes = f.read()
+        return row, data["full_name"], generate_pdf(data, photo_bytes, template), None
+    except Exception as e:
+        return row, str(record.get("full_name") or ""), None, f"{type(e).__name__}: {e}"
+
+
+def _warm_worker(template: str = DEFAULT_TEMPLATE):
+    get_font_registry()
+    compile_template(template)
+
+
+def generate_batch(records_path: str, photos_dir: str, out, workers=None, progress=None,
+                   template: str = DEFAULT_TEMPLATE) -> dict:
+    """
+    Render every record in `records_path` across a process pool and stream the
+    PDFs into a ZIP written to `out` (a path or a binary file object, which
+    need not be seekable). Bad rows are collected instead of aborting the run;
+    they are listed in the returned summary and in errors.csv inside the ZIP.
+
+    `progress(done, total)` is called after each record. Every worker compiles
+    `template` once and reuses the plan for all of its records.
+    """
+    compile_template(template)  # fail fast on an unknown template name
+    records = load_records(records_path)
+    total = len(records)
+    workers = workers or os.cpu_count() or 1
+    errors, written, names = [], 0, set()
+    jobs = []
+    for i, r in enumerate(records):
+        if isinstance(r, dict):
+            jobs.append((i + 1, r, find_photo(photos_dir, r), template))
         else:
-            photo_ok = False
-            st.error("Photo must be 1 MB or smaller. Please upload a smaller image.")
-    else:
-        st.info("No photo uploaded yet.")
+            errors.append({"row": i + 1, "full_name": "", "error": f"{type(r).__name__}: {r}"})
 
-    st.subheader("Education")
-    degree = st.text_input("Degree / Qualification", value="")
-    institution = st.text_input("University / Institution", value="")
-    graduation_date = st.text_input("Graduation Date (e.g., 2020 or May 2020)", value="")
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_STORED) as zf, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_warm_worker,
+                                initargs=(template,)) as pool:
+        # keep a bounded number of jobs in flight so memory stays flat for large cohorts
+        pending, queue, done = set(), iter(jobs), len(errors)
+        while True:
+            while len(pending) < workers * 4:
+                job = next(queue, None)
+                if job is None:
+                    break
+                pending.add(pool.submit(_render_batch_record, job))
+            if not pending:
+                break
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                row, name, pdf_bytes, error = fut.result()
+                if error:
+                    errors.append({"row": row, "full_name": name, "error": error})
+                else:
+                    arcname = resume_filename(name)
+                    if arcname in names:
+                        arcname = arcname.replace("_Resume.pdf", f"_{row}_Resume.pdf")
+                    names.add(arcname)
+                    # PDF streams are already compressed; storing keeps the writer cheap
+                    zf.writestr(arcname, pdf_bytes)
+                    written += 1
+                done += 1
+                if progress:
+                    progress(done, total)
 
-    st.subheader("Licenses & Certifications")
-    license_number = st.text_input("License Number", value="")
+        if errors:
+            errors.sort(key=lambda e: e["row"])
+            buf = StringIO()
+            writer = csv.DictWriter(buf, fieldnames=["row", "full_name", "error"])
+            writer.writeheader()
+            writer.writerows(errors)
+            zf.writestr("errors.csv", buf.getvalue())
 
-    st.subheader("Professional Experience")
-    job_title = st.text_input("Most Recent Job Title", value="")
-    duties = st.text_area("Duties & Achievements (one per line)", height=140)
+    return {"total": total, "written": written, "errors": errors}
 
-    st.subheader("Skills (comma-separated)")
-    hard_skills = st.text_input("Hard Skills (e.g., Phlebotomy, EKG)", value="")
-    soft_skills = st.text_input("Soft Skills (e.g., Communication, Empathy)", value="")
 
-    # Validation: all fields mandatory
-    required_values = [
-        full_name, phone, email, city_state, summary,
-        photo_file, degree, institution, graduation_date,
-        license_number, job_title, duties, hard_skills, soft_skills
-    ]
-    all_filled = all([(v is not None and (not isinstance(v, str) or v.strip() != "")) for v in required_values])
-    if photo_file and not photo_ok:
-        all_filled = False
+def batch_cli(argv) -> int:
+    """python streamlitassignment.py batch records.csv photos/ resumes.zip [--workers N]"""
+    parser = argparse.ArgumentParser(prog="streamlitassignment.py batch",
+                                     description="Generate resume PDFs in bulk into a ZIP.")
+    parser.add_argument("records", help="CSV or JSONL with the form fields")
+    parser.add_argument("photos", help="folder with one photo per record")
+    parser.add_argument("out", help="output .zip path, or - for stdout")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    parser.add_argument("--template", choices=list(TEMPLATES), default=DEFAULT_TEMPLATE)
+    args = parser.parse_args(argv)
+
+    def report(done, total):
+        print(f"\r{done}/{total} records", end="", file=sys.stderr, flush=True)
+
+    out = sys.stdout.buffer if args.out == "-" else args.out
+    summary = generate_batch(args.records, args.photos, out, workers=args.workers,
+                             progress=report, template=args.template)
+    print(file=sys.stderr)
+    for err in summary["errors"]:
+        print(f"row {err['row']} ({err['full_name'] or 'unnamed'}): {err['error']}", file=sys.stderr)
+    print(f"{summary['written']}/{summary['total']} resumes written, "
+          f"{len(summary['errors'])} failed", file=sys.stderr)
+    return 1 if summary["errors"] else 0
+
+# ---------- UI ----------
+PREVIEW_COLS = [2, 1]  # input column, live preview column
+TIMING_SAMPLES = 50
+
 
-    st.markdown("---")
+def _text(key: str) -> str:
+    return (st.session_state.get(key) or "").strip()
 
-    if all_filled:
-        st.success("All required fields look filled. Ready to generate PDF.")
+
+def _record_timing(scope: str, ms: float):
+    timings = st.session_state.setdefault("_rerun_timings", {})
+    timings.setdefault(scope, deque(maxlen=TIMING_SAMPLES)).append(ms)
+
+
+def _run_section(fn):
+    """
+    Run one form section. With fragment reruns on, the section is an
+    st.fragment: editing one of its inputs reruns only that section (its
+    inputs and its slice of the live preview), not the whole script.
+    """
+    @functools.wraps(fn)
+    def timed():
+        t0 = time.perf_counter()
+        fn()
+        # time only fragment-scoped reruns; full runs are timed (and saved) by main()
+        if not st.session_state.get("_in_full_run"):
+            _autosave_draft()
+            _record_timing(fn.__name__.strip("_"), (time.perf_counter() - t0) * 1000)
+
+    if st.session_state.get("use_fragments", True):
+        st.fragment(timed)()
     else:
-        st.warning("Please fill all fields and upload a valid photo (≤ 1 MB).")
+        timed()
 
-    if st.button("Generate Resume PDF", disabled=(not all_filled)):
-        photo_bytes = None
+
+def _mark_filled(section: str, filled: bool):
+    """
+    The status banner and Generate button live in another section, so when a
+    fragment rerun flips a section between empty and complete, follow up with
+    one full rerun to refresh them. Ordinary edits stay fragment-scoped.
+    """
+    states = st.session_state.setdefault("_filled", {})
+    prev = states.get(section)
+    states[section] = filled
+    if prev is not None and prev != filled and not st.session_state.get("_in_full_run"):
+        st.rerun()
+
+
+def _open_draft(draft_id: str):
+    """Load a saved draft into the widget keys, once per draft per session."""
+    ss = st.session_state
+    if ss.get("_draft_loaded") == draft_id:
+        return
+    ss["_draft_loaded"] = draft_id
+    ss["draft_photo_jpeg"] = None
+    saved = get_draft_store().load(draft_id)
+    if saved is None:
+        return
+    data, photo_jpeg, template = saved
+    for k in REQUIRED_FIELDS:
+        ss[k] = data.get(k, "")
+    ss["draft_photo_jpeg"] = ss["photo_jpeg"] = photo_jpeg
+    if template in TEMPLATES:
+        ss["template"] = template
+    ss["_draft_hash"] = _draft_hash()
+
+
+def _draft_hash() -> str:
+    ss = st.session_state
+    return render_key({k: ss.get(k) for k in REQUIRED_FIELDS}, ss.get("photo_jpeg"),
+                      ss.get("template", DEFAULT_TEMPLATE))
+
+
+def _autosave_draft():
+    """Persist the draft when anything that would change the resume changed."""
+    ss = st.session_state
+    draft_id = ss.get("_draft_loaded")
+    if not draft_id:
+        return
+    current = _draft_hash()
+    if current == ss.get("_draft_hash"):
+        return
+    ss["_draft_hash"] = current
+    data = {k: ss.get(k) or "" for k in REQUIRED_FIELDS}
+    if not any(data.values()) and not ss.get("photo_jpeg"):
+        return  # nothing typed yet; don't create empty drafts
+    try:
+        get_draft_store().save(draft_id, data, ss.get("photo_jpeg"), ss.get("template", DEFAULT_TEMPLATE))
+    except sqlite3.Error as e:
+        st.toast(f"Could not save draft: {e}")
+
+
+def _contact_section():
+    left, right = st.columns(PREVIEW_COLS)
+    with left:
+        full_name = st.text_input("Full Name", key="full_name")
+        phone = st.text_input("Phone Number", key="phone")
+        email = st.text_input("Email Address", key="email")
+        city_state = st.text_input("City, State", key="city_state")
+    with right:
+        st.markdown("#### " + (full_name if full_name else "Full Name"))
+        st.write(f"{city_state}")
+        st.write(f"📞 {phone} | ✉️ {email}")
+    _mark_filled("contact", all(_text(k) for k in ("full_name", "phone", "email", "city_state")))
+
+
+def _summary_section():
+    left, right = st.columns(PREVIEW_COLS)
+    with left:
+        st.subheader("Professional Summary")
+        summary = st.text_area("Write a short professional summary", height=120, key="summary")
+    with right:
+        st.markdown("**Professional Summary**")
+        st.write(summary if summary else "Your professional summary will appear here.")
+    _mark_filled("summary", bool(_text("summary")))
+
+
+def _photo_section():
+    ss = st.session_state
+    left, right = st.columns(PREVIEW_COLS)
+    with left:
+        st.subheader("Photo Upload")
+        photo_file = st.file_uploader("Upload professional photo (large photos are resized automatically)",
+                                      type=["png", "jpg", "jpeg"], key="photo_file")
+        ss["photo_ok"] = None
+        ss["photo_jpeg"] = None
         if photo_file:
-            photo_bytes = photo_file.read()
-        data = {
-            "full_name": full_name.strip(),
-            "phone": phone.strip(),
-            "email": email.strip(),
-            "city_state": city_state.strip(),
-            "summary": summary.strip(),
-            "degree": degree.strip(),
-            "institution": institution.strip(),
-            "graduation_date": graduation_date.strip(),
-            "license_number": license_number.strip(),
-            "job_title": job_title.strip(),
-            "duties": duties.strip(),
-            "hard_skills": hard_skills.strip(),
-            "soft_skills": soft_skills.strip(),
-        }
-        try:
-            pdf_bytes = generate_pdf(data, photo_bytes)
-            st.session_state['resume_pdf_bytes'] = pdf_bytes
-            st.success("PDF generated — click Download to save the resume.")
-        except Exception as e:
-            st.error(f"Failed to generate PDF: {e}")
-
-    if st.session_state.get('resume_pdf_bytes'):
-        fname = f"{full_name.strip().replace(' ', '_')}_Resume.pdf" if full_name else "resume.pdf"
-        st.download_button(
-            label="Download Resume PDF",
-            data=st.session_state['resume_pdf_bytes'],
-            file_name=fname,
-            mime="application/pdf"
-        )
-
-with col2:
-    st.header("Live Preview")
-    st.markdown("#### " + (full_name if full_name else "Full Name"))
-    st.write(f"**{job_title}**" if job_title else "")
-    st.write(f"{city_state}")
-    st.write(f"📞 {phone} | ✉️ {email}")
-    st.markdown("**Professional Summary**")
-    st.write(summary if summary else "Your professional summary will appear here.")
-    st.markdown("**Education**")
-    if degree or institution or graduation_date:
-        st.write(f"{degree} — {institution} ({graduation_date})")
+            if bytes_size_ok(photo_file):
+                try:
+                    ss["photo_jpeg"] = get_photo_cache().get(photo_file.getvalue())
+                    ss["photo_ok"] = True
+                    if uploaded_size(photo_file) > MAX_PHOTO_BYTES:
+                        st.caption(f"Large photo recompressed to {len(ss['photo_jpeg']) // 1024} KB.")
+                except Exception:
+                    ss["photo_ok"] = False
+                    st.error("Could not read this image. Please upload a PNG or JPEG photo.")
+            else:
+                ss["photo_ok"] = False
+                st.error(f"Photo must be {MAX_UPLOAD_BYTES // 1_000_000} MB or smaller. Please upload a smaller image.")
+        elif ss.get("draft_photo_jpeg"):
+            ss["photo_jpeg"] = ss["draft_photo_jpeg"]
+            ss["photo_ok"] = True
+            st.caption("Photo restored from your saved draft. Upload a new one to replace it.")
+        else:
+            st.info("No photo uploaded yet.")
+    with right:
+        if ss["photo_jpeg"]:
+            st.image(ss["photo_jpeg"], caption="Uploaded photo preview", width=PHOTO_PX)
+    _mark_filled("photo", bool(ss["photo_ok"]))
+
+
+def _education_section():
+    left, right = st.columns(PREVIEW_COLS)
+    with left:
+        st.subheader("Education")
+        degree = st.text_input("Degree / Qualification", key="degree")
+        institution = st.text_input("University / Institution", key="institution")
+        graduation_date = st.text_input("Graduation Date (e.g., 2020 or May 2020)", key="graduation_date")
+    with right:
+        st.markdown("**Education**")
+        if degree or institution or graduation_date:
+            st.write(f"{degree} — {institution} ({graduation_date})")
+        else:
+            st.write("Education info will appear here.")
+    _mark_filled("education", all(_text(k) for k in ("degree", "institution", "graduation_date")))
+
+
+def _license_section():
+    left, _ = st.columns(PREVIEW_COLS)
+    with left:
+        st.subheader("Licenses & Certifications")
+        st.text_input("License Number", key="license_number")
+    _mark_filled("license", bool(_text("license_number")))
+
+
+def _experience_section():
+    left, right = st.columns(PREVIEW_COLS)
+    with left:
+        st.subheader("Professional Experience")
+        job_title = st.text_input("Most Recent Job Title", key="job_title")
+        st.text_area("Duties & Achievements (one per line)", height=140, key="duties")
+    with right:
+        st.write(f"**{job_title}**" if job_title else "")
+    _mark_filled("experience", bool(_text("job_title") and _text("duties")))
+
+
+def _skills_section():
+    left, _ = st.columns(PREVIEW_COLS)
+    with left:
+        st.subheader("Skills (comma-separated)")
+        st.text_input("Hard Skills (e.g., Phlebotomy, EKG)", key="hard_skills")
+        st.text_input("Soft Skills (e.g., Communication, Empathy)", key="soft_skills")
+    _mark_filled("skills", bool(_text("hard_skills") and _text("soft_skills")))
+
+
+def _generate_section():
+    ss = st.session_state
+    left, _ = st.columns(PREVIEW_COLS)
+    with left:
+        # Validation: all fields mandatory
+        all_filled = all(_text(k) for k in REQUIRED_FIELDS) and bool(ss.get("photo_ok"))
+
+        st.markdown("---")
+
+        if all_filled:
+            st.success("All required fields look filled. Ready to generate PDF.")
+        else:
+            st.warning("Please fill all fields and upload a valid photo.")
+
+        formats = st.multiselect("Formats", list(EXPORT_FORMATS), default=["pdf"],
+                                 format_func=str.upper, key="export_formats")
+
+        if st.button("Generate Resume", disabled=(not all_filled or not formats)):
+            data = {k: _text(k) for k in REQUIRED_FIELDS}
+            template = ss.get("template", DEFAULT_TEMPLATE)
+            try:
+                # only digests live in the session; the bytes live in the PDF store
+                digests, errors, hits = render_cached(data, ss.get("photo_jpeg"), template, formats)
+                ss['resume_digests'] = digests
+                for fmt, err in errors.items():
+                    st.error(f"Failed to generate {fmt.upper()}: {err}")
+                if digests and len(hits) == len(digests):
+                    st.success("Nothing changed since the last export — reusing it. Click Download to save.")
+                elif digests:
+                    st.success("Resume generated — click Download to save it.")
+            except Exception as e:
+                st.error(f"Failed to generate resume: {e}")
+
+        for fmt, digest in list(ss.get('resume_digests', {}).items()):
+            _, mime, ext = EXPORT_FORMATS[fmt]
+            file_bytes = get_pdf_store().get(digest)
+            if file_bytes is None:
+                del ss['resume_digests'][fmt]
+                st.info(f"The generated {fmt.upper()} has expired. Please generate it again.")
+                continue
+            st.download_button(
+                label=f"Download Resume {fmt.upper()}",
+                data=file_bytes,
+                file_name=resume_filename(_text("full_name")).replace(".pdf", ext),
+                mime=mime,
+                key=f"download_{fmt}",
+            )
+
+
+def _timings_panel():
+    """Sidebar table of script execution time per interaction, by rerun scope."""
+    st.subheader("Rerun timings")
+    rows = [
+        {"scope": scope, "runs": len(ms), "last ms": round(ms[-1], 1),
+         "mean ms": round(sum(ms) / len(ms), 1)}
+        for scope, ms in st.session_state.get("_rerun_timings", {}).items() if ms
+    ]
+    if rows:
+        st.dataframe(rows, hide_index=True, width="stretch")
     else:
-        st.write("Education info will appear here.")
+        st.caption("Interact with the form to collect timings.")
+
+
+def main():
+    st.set_page_config(page_title="Nurse Resume Builder", layout="wide")
+    ss = st.session_state
+    t0 = time.perf_counter()
+    ss["_in_full_run"] = True
+    try:
+        draft_id = st.query_params.get("draft")
+        if not draft_id:
+            draft_id = st.query_params["draft"] = uuid.uuid4().hex[:12]
+        _open_draft(draft_id)
+
+        with st.sidebar:
+            st.caption(f"Draft `{draft_id}` is saved automatically. Bookmark this page to come back to it.")
+            st.selectbox("Resume template", list(TEMPLATES), key="template")
+            st.checkbox("Fragment reruns", value=True, key="use_fragments",
+                        help="Off = every edit reruns the whole script (the old behaviour), for comparison.")
+            st.fragment(_timings_panel, run_every=2)()
+
+        st.title("🩺 Nurse Resume Builder — Streamlit")
+
+        left, right = st.columns(PREVIEW_COLS)
+        left.header("Enter your details")
+        right.header("Live Preview")
+
+        for section in (_contact_section, _summary_section, _photo_section, _education_section,
+                        _license_section, _experience_section, _skills_section, _generate_section):
+            _run_section(section)
+        _autosave_draft()
+    finally:
+        ss["_in_full_run"] = False
+    mode = "fragments" if ss.get("use_fragments", True) else "classic"
+    _record_timing(f"full script ({mode})", (time.perf_counter() - t0) * 1000)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        sys.exit(batch_cli(sys.argv[2:]))
+    main()